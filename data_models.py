@@ -5,6 +5,8 @@ from datetime import datetime
 from typing import Optional, List, Dict, Literal
 from enum import Enum
 import json
+import numpy as np
+import orjson
 
 class OrderSide(Enum):
     BUY = "BUY"
@@ -22,13 +24,31 @@ class GridLevel(Enum):
     MAIN_TREND = "main_trend"    # 主趋势层 ±15% 
     INSURANCE = "insurance"      # 保险层 ±50%
 
+# 视为活跃（占用资金、可撤销）的订单状态
+ACTIVE_ORDER_STATUSES = (OrderStatus.NEW, OrderStatus.PENDING)
+
+# SoA 批量表示中枚举列的 int8 编码
+ORDER_SIDE_CODES = {side: code for code, side in enumerate(OrderSide)}
+GRID_LEVEL_CODES = {level: code for code, level in enumerate(GridLevel)}
+ORDER_STATUS_CODES = {status: code for code, status in enumerate(OrderStatus)}
+
+def _json_default(obj):
+    """orjson 不原生支持的类型: Decimal 按数值输出，与 to_dict 保持一致"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+def dumps_json(obj) -> bytes:
+    """直接序列化数据类/枚举/datetime (含列表)，不经过中间 dict"""
+    return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
 class MarketState(Enum):
     SIDEWAYS = "sideways"        # 震荡
     BULL = "bull"               # 牛市
     BEAR = "bear"               # 熊市
     VOLATILE = "volatile"        # 高波动
 
-@dataclass
+@dataclass(slots=True)
 class TradingConfig:
     """交易配置 - 简化版"""
     # 基础配置
@@ -56,6 +76,7 @@ class TradingConfig:
     # 系统配置
     check_interval: int = 5  # 检查间隔(秒)
     web_port: int = 8080
+    pragma_synchronous: str = "NORMAL"  # SQLite同步级别: 回测用OFF, 实盘用NORMAL
     
     # API配置
     binance_api_key: str = ""
@@ -67,7 +88,7 @@ class TradingConfig:
     telegram_chat_id: str = ""
     enable_notifications: bool = False
 
-@dataclass 
+@dataclass(slots=True)
 class OrderInfo:
     """订单信息"""
     id: str
@@ -98,8 +119,11 @@ class OrderInfo:
             'filled_at': self.filled_at.isoformat() if self.filled_at else None,
             'profit': float(self.profit)
         }
+    
+    def to_json_bytes(self) -> bytes:
+        return dumps_json(self)
 
-@dataclass
+@dataclass(slots=True)
 class TradeRecord:
     """交易记录"""
     trade_id: str
@@ -126,8 +150,61 @@ class TradeRecord:
             'grid_level': self.grid_level.value,
             'executed_at': self.executed_at.isoformat()
         }
+    
+    def to_json_bytes(self) -> bytes:
+        return dumps_json(self)
+
+@dataclass(slots=True)
+class OrderBatch:
+    """订单批量列式表示 (SoA)，数值列为连续 float64 数组，便于整列向量化计算"""
+    ids: List[str]
+    price: np.ndarray       # float64
+    quantity: np.ndarray    # float64
+    profit: np.ndarray      # float64
+    side: np.ndarray        # int8, 见 ORDER_SIDE_CODES
+    grid_level: np.ndarray  # int8, 见 GRID_LEVEL_CODES
+    
+    @classmethod
+    def empty(cls) -> "OrderBatch":
+        return cls(
+            ids=[],
+            price=np.empty(0), quantity=np.empty(0), profit=np.empty(0),
+            side=np.empty(0, dtype=np.int8), grid_level=np.empty(0, dtype=np.int8)
+        )
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def notional(self) -> float:
+        """订单总价值 sum(price * quantity)"""
+        return float(np.dot(self.price, self.quantity))
+    
+    def count_by_level(self) -> Dict[GridLevel, int]:
+        """各网格层级的订单数"""
+        counts = np.bincount(self.grid_level, minlength=len(GRID_LEVEL_CODES))
+        return {level: int(counts[code]) for level, code in GRID_LEVEL_CODES.items()}
 
-@dataclass
+@dataclass(slots=True)
+class CapitalAllocation:
+    """各网格层级的资金占用 (USDT)，字段名与 GridLevel 取值一致，可按层级下标读写"""
+    high_freq: float = 0.0
+    main_trend: float = 0.0
+    insurance: float = 0.0
+    
+    def __getitem__(self, level: GridLevel) -> float:
+        return getattr(self, level.value)
+    
+    def __setitem__(self, level: GridLevel, amount: float):
+        setattr(self, level.value, amount)
+    
+    def to_dict(self) -> dict:
+        return {
+            'high_freq': self.high_freq,
+            'main_trend': self.main_trend,
+            'insurance': self.insurance
+        }
+
+@dataclass(slots=True)
 class PerformanceMetrics:
     """性能指标"""
     total_pnl: Decimal = Decimal("0")
@@ -144,7 +221,8 @@ class PerformanceMetrics:
     def calculate_win_rate(self) -> Decimal:
         if self.total_trades == 0:
             return Decimal("0")
-        return (Decimal(self.winning_trades) / Decimal(self.total_trades)) * 100
+        # 整数运算得到万分比，只构造一次 Decimal，结果为两位小数的百分比
+        return Decimal(self.winning_trades * 10000 // self.total_trades) / 100
     
     def to_dict(self) -> dict:
         return {
@@ -159,8 +237,11 @@ class PerformanceMetrics:
             'daily_return': float(self.daily_return),
             'updated_at': self.updated_at.isoformat()
         }
+    
+    def to_json_bytes(self) -> bytes:
+        return dumps_json(self)
 
-@dataclass
+@dataclass(slots=True)
 class SystemStatus:
     """系统状态"""
     running: bool = False
@@ -180,4 +261,7 @@ class SystemStatus:
             'last_update': self.last_update.isoformat(),
             'error_message': self.error_message,
             'uptime_seconds': self.uptime_seconds
-        }
\ No newline at end of file
+        }
+    
+    def to_json_bytes(self) -> bytes:
+        return dumps_json(self)
\ No newline at end of file
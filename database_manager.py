@@ -1,186 +1,611 @@
 # database_manager.py - SQLite数据库管理器
 import sqlite3
-import json
 import logging
+import threading
+import queue
+import time
+import atexit
+import itertools
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional, Dict
-from datetime import datetime, date
+from typing import List, Optional, Dict, Iterator, Tuple
+from datetime import datetime, date, timedelta
 from decimal import Decimal
+import numpy as np
 from data_models import *
+from metrics_kernels import rolling_drawdown
+
+# synchronous 可选值: OFF 用于回测, NORMAL 用于实盘 (WAL 下仅在 checkpoint 时 fsync)
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# 枚举值 <-> 成员的预计算映射，替代逐行 Enum(...) 构造与 .value 属性访问
+_SIDE_MAP = {m.value: m for m in OrderSide}
+_STATUS_MAP = {m.value: m for m in OrderStatus}
+_LEVEL_MAP = {m.value: m for m in GridLevel}
+_SIDE_VAL = {m: m.value for m in OrderSide}
+_STATUS_VAL = {m: m.value for m in OrderStatus}
+_LEVEL_VAL = {m: m.value for m in GridLevel}
+
+# iter_* 每次从游标取出的行数
+_FETCH_SIZE = 1000
+
+# 表结构版本 (PRAGMA user_version)
+# v1: 金额列改为 DECIMAL
+# v2: 时间列改为 EPOCH_US (INTEGER, 本地时间的 Unix 微秒)
+SCHEMA_VERSION = 2
+
+def _convert_decimal(value: bytes) -> Decimal:
+    return Decimal(value.decode())
+
+def _adapt_datetime(value: datetime) -> int:
+    return int(value.timestamp()) * 1_000_000 + value.microsecond
+
+def _convert_epoch_us(value: bytes) -> datetime:
+    seconds, micros = divmod(int(value), 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
+# DECIMAL 列读出直接为 Decimal，写入 Decimal 时按字符串绑定，无需 float 往返
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+sqlite3.register_adapter(Decimal, str)
+
+# datetime 以整数微秒存取，替代 isoformat / fromisoformat 字符串解析
+sqlite3.register_converter("EPOCH_US", _convert_epoch_us)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+
+# v2 之前以 ISO 文本存储的时间列
+_TIMESTAMP_COLUMNS = {
+    'orders': ('created_at', 'filled_at'),
+    'trades': ('executed_at',),
+    'performance': ('updated_at',),
+    'system_logs': ('timestamp',),
+    'grid_states': ('last_rebuild', 'updated_at'),
+}
+
+def _sql_iso_to_epoch_us(column: str) -> str:
+    """ISO 文本(本地时间) -> Unix 微秒，供旧库迁移使用"""
+    return (
+        f"CAST(strftime('%s', {column}, 'utc') AS INTEGER) * 1000000"
+        f" + CASE WHEN instr({column}, '.') > 0"
+        f" THEN CAST(substr({column} || '000000', instr({column}, '.') + 1, 6) AS INTEGER)"
+        f" ELSE 0 END"
+    )
+
+_SQL_CREATE_TABLES = """
+    -- 订单表
+    CREATE TABLE IF NOT EXISTS orders (
+        id TEXT PRIMARY KEY,
+        exchange_order_id TEXT,
+        symbol TEXT NOT NULL,
+        side TEXT NOT NULL,
+        price DECIMAL NOT NULL,
+        quantity DECIMAL NOT NULL,
+        status TEXT NOT NULL,
+        grid_level TEXT NOT NULL,
+        grid_index INTEGER NOT NULL,
+        created_at EPOCH_US NOT NULL,
+        filled_at EPOCH_US,
+        profit DECIMAL DEFAULT 0
+    );
+    
+    -- 交易记录表
+    CREATE TABLE IF NOT EXISTS trades (
+        trade_id TEXT PRIMARY KEY,
+        order_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        side TEXT NOT NULL,
+        price DECIMAL NOT NULL,
+        quantity DECIMAL NOT NULL,
+        commission DECIMAL DEFAULT 0,
+        profit DECIMAL DEFAULT 0,
+        grid_level TEXT NOT NULL,
+        executed_at EPOCH_US NOT NULL
+    );
+    
+    -- 性能指标表
+    CREATE TABLE IF NOT EXISTS performance (
+        date TEXT PRIMARY KEY,
+        total_pnl DECIMAL DEFAULT 0,
+        realized_pnl DECIMAL DEFAULT 0,
+        unrealized_pnl DECIMAL DEFAULT 0,
+        total_trades INTEGER DEFAULT 0,
+        winning_trades INTEGER DEFAULT 0,
+        win_rate DECIMAL DEFAULT 0,
+        max_drawdown DECIMAL DEFAULT 0,
+        current_drawdown DECIMAL DEFAULT 0,
+        daily_return DECIMAL DEFAULT 0,
+        updated_at EPOCH_US NOT NULL
+    );
+    
+    -- 系统日志表
+    CREATE TABLE IF NOT EXISTS system_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp EPOCH_US NOT NULL,
+        level TEXT NOT NULL,
+        component TEXT NOT NULL,
+        message TEXT NOT NULL,
+        details TEXT
+    );
+    
+    -- 网格状态表
+    CREATE TABLE IF NOT EXISTS grid_states (
+        grid_level TEXT PRIMARY KEY,
+        center_price REAL NOT NULL,
+        active_orders INTEGER DEFAULT 0,
+        integrity_percentage REAL DEFAULT 0,
+        last_rebuild EPOCH_US,
+        updated_at EPOCH_US NOT NULL
+    );
+    
+    -- 按日预聚合的交易统计，由 trades 触发器维护
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        date TEXT PRIMARY KEY,
+        n_trades INTEGER NOT NULL DEFAULT 0,
+        n_winners INTEGER NOT NULL DEFAULT 0,
+        sum_profit DECIMAL NOT NULL DEFAULT 0,
+        sum_commission DECIMAL NOT NULL DEFAULT 0
+    );
+"""
+
+_SQL_CREATE_INDEXES = """
+    -- 创建索引
+    CREATE INDEX IF NOT EXISTS idx_orders_grid_level ON orders(grid_level);
+    CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON system_logs(timestamp);
+    
+    -- 活跃订单查询: status IN (...) AND grid_level = ? ORDER BY created_at DESC
+    CREATE INDEX IF NOT EXISTS idx_orders_active ON orders(status, grid_level, created_at DESC);
+    -- 不限网格层级的 status + created_at 过滤 (执行统计)
+    CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at);
+    -- 覆盖索引: 按日期范围聚合 COUNT/SUM 无需回表
+    CREATE INDEX IF NOT EXISTS idx_trades_exec_profit ON trades(executed_at, profit, commission);
+    
+    -- 以上复合索引的前缀已覆盖的旧单列索引
+    DROP INDEX IF EXISTS idx_orders_status;
+    DROP INDEX IF EXISTS idx_trades_executed_at;
+"""
+
+# executed_at 为本地时间的 epoch 微秒，按本地日期归入 daily_rollup
+_SQL_ROLLUP_DATE = "date({}.executed_at / 1000000, 'unixepoch', 'localtime')"
+
+# INSERT OR REPLACE 删除旧行时须开启 recursive_triggers 才会触发 DELETE 触发器，否则重复计数
+_SQL_CREATE_TRIGGERS = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_trades_rollup_insert AFTER INSERT ON trades
+    BEGIN
+        INSERT INTO daily_rollup (date, n_trades, n_winners, sum_profit, sum_commission)
+        VALUES ({_SQL_ROLLUP_DATE.format('NEW')}, 1, NEW.profit > 0, NEW.profit, NEW.commission)
+        ON CONFLICT(date) DO UPDATE SET
+            n_trades = n_trades + 1,
+            n_winners = n_winners + excluded.n_winners,
+            sum_profit = sum_profit + excluded.sum_profit,
+            sum_commission = sum_commission + excluded.sum_commission;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_trades_rollup_delete AFTER DELETE ON trades
+    BEGIN
+        UPDATE daily_rollup SET
+            n_trades = n_trades - 1,
+            n_winners = n_winners - (OLD.profit > 0),
+            sum_profit = sum_profit - OLD.profit,
+            sum_commission = sum_commission - OLD.commission
+        WHERE date = {_SQL_ROLLUP_DATE.format('OLD')};
+    END;
+"""
+
+# 旧库首次建立汇总表时从 trades 回填
+_SQL_BACKFILL_ROLLUP = f"""
+    INSERT INTO daily_rollup (date, n_trades, n_winners, sum_profit, sum_commission)
+    SELECT {_SQL_ROLLUP_DATE.format('trades')}, COUNT(*), SUM(profit > 0), SUM(profit), SUM(commission)
+    FROM trades
+    GROUP BY 1
+"""
+
+# 固定SQL文本，保证命中连接上的语句缓存
+_SQL_INSERT_ORDER = """
+    INSERT OR REPLACE INTO orders
+    (id, exchange_order_id, symbol, side, price, quantity, status,
+     grid_level, grid_index, created_at, filled_at, profit)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+@lru_cache(maxsize=None)
+def _sql_select_orders(n_statuses: int, by_level: bool, by_created: bool = False) -> str:
+    """按过滤条件组合生成订单查询，同一组合复用同一 SQL 文本以命中语句缓存"""
+    where = [f"status IN ({', '.join('?' * n_statuses)})"]
+    if by_level:
+        where.append("grid_level = ?")
+    if by_created:
+        where.append("created_at < ?")
+    return f"SELECT * FROM orders WHERE {' AND '.join(where)} ORDER BY created_at DESC"
+
+def _sql_case(column: str, codes: dict) -> str:
+    """枚举列 -> int8 编码的 CASE 表达式"""
+    whens = " ".join(f"WHEN '{member.value}' THEN {code}" for member, code in codes.items())
+    return f"CASE {column} {whens} END"
+
+# 列式读取: 数值列取 REAL 跳过 DECIMAL 转换器，枚举列在 SQL 中直接编码
+_SQL_SELECT_ACTIVE_BATCH = f"""
+    SELECT id,
+           CAST(price AS REAL),
+           CAST(quantity AS REAL),
+           CAST(profit AS REAL),
+           {_sql_case('side', ORDER_SIDE_CODES)},
+           {_sql_case('grid_level', GRID_LEVEL_CODES)}
+    FROM orders WHERE status IN ('NEW', 'PENDING')
+"""
+
+# 列出全部状态使 status 成为索引等值前缀，按 created_at 范围查找而非扫描整个索引
+_SQL_EXECUTION_STATS = f"""
+    SELECT COUNT(*), COALESCE(SUM(status = '{OrderStatus.FAILED.value}'), 0)
+    FROM orders
+    WHERE status IN ({', '.join(f"'{status.value}'" for status in OrderStatus)})
+      AND created_at > ?
+"""
+
+_ORDER_BATCH_DTYPE = np.dtype([
+    ('id', 'O'),
+    ('price', 'f8'),
+    ('quantity', 'f8'),
+    ('profit', 'f8'),
+    ('side', 'i1'),
+    ('grid_level', 'i1'),
+])
+
+# update_order_status 的可选列: 按位掩码预生成全部 2^3 条 UPDATE，SQL 文本固定以命中语句缓存
+_ORDER_UPDATE_COLUMNS = ('exchange_order_id', 'filled_at', 'profit')
+_SQL_UPDATE_ORDER = {
+    mask: "UPDATE orders SET " + ", ".join(
+        ["status = ?"] + [f"{col} = ?" for bit, col in enumerate(_ORDER_UPDATE_COLUMNS) if mask >> bit & 1]
+    ) + " WHERE id = ?"
+    for mask in range(1 << len(_ORDER_UPDATE_COLUMNS))
+}
+
+_SQL_INSERT_TRADE = """
+    INSERT OR REPLACE INTO trades
+    (trade_id, order_id, symbol, side, price, quantity,
+     commission, profit, grid_level, executed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_SELECT_TRADES = """
+    SELECT * FROM trades
+    WHERE executed_at >= ?
+    ORDER BY executed_at DESC
+"""
+
+_SQL_SELECT_PERFORMANCE = "SELECT * FROM performance WHERE date = ?"
+
+_SQL_DAILY_ROLLUP = """
+    SELECT n_trades, n_winners, sum_profit, sum_commission
+    FROM daily_rollup
+    WHERE date = ?
+"""
+
+_SQL_TOTAL_PNL = "SELECT SUM(sum_profit) as total_pnl FROM daily_rollup"
+
+# 序列查询直接取 REAL，跳过 DECIMAL 转换器，整列进入 NumPy
+_SQL_SELECT_PERFORMANCE_SERIES = """
+    SELECT date,
+           CAST(total_pnl AS REAL),
+           CAST(realized_pnl AS REAL),
+           total_trades,
+           winning_trades
+    FROM performance
+    WHERE date >= ?
+    ORDER BY date
+"""
+
+_PERFORMANCE_SERIES_DTYPE = np.dtype([
+    ('date', 'U10'),
+    ('total_pnl', 'f8'),
+    ('realized_pnl', 'f8'),
+    ('total_trades', 'i8'),
+    ('winning_trades', 'i8'),
+])
+
+_SQL_INSERT_PERFORMANCE = """
+    INSERT OR REPLACE INTO performance
+    (date, total_pnl, realized_pnl, unrealized_pnl, total_trades,
+     winning_trades, win_rate, max_drawdown, current_drawdown,
+     daily_return, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_LOG = """
+    INSERT INTO system_logs (timestamp, level, component, message, details)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_STATS_TABLES = ('orders', 'trades', 'performance', 'system_logs', 'grid_states')
+_SQL_TABLE_COUNTS = " UNION ALL ".join(
+    f"SELECT '{table}', COUNT(*) FROM {table}" for table in _STATS_TABLES
+)
+
+# 日志后台写入: 每 100ms 或攒满 500 条提交一次
+_LOG_FLUSH_INTERVAL = 0.1
+_LOG_BATCH_SIZE = 500
 
 class DatabaseManager:
     """轻量级SQLite数据库管理器"""
     
-    def __init__(self, db_path: str = "grid_trading.db"):
+    def __init__(self, db_path: str = "grid_trading.db", synchronous: str = "NORMAL"):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Invalid synchronous mode: {synchronous}")
+        
         self.db_path = db_path
+        self.synchronous = synchronous
         self.logger = logging.getLogger(__name__)
+        
+        # 每个线程一个长连接（交易循环 / Web线程各自持有）
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # 订单写入版本号: 每次写入订单表后更新，读取方比较版本即可判断活跃订单是否变化
+        # (next() 在多线程下不会发出重复值)
+        self._orders_seq = itertools.count(1)
+        self.orders_version = 0
+        
         self._ensure_database()
+        
+        # 日志写入移出调用线程，由后台线程批量落盘；退出时清空队列
+        self._log_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._log_thread = threading.Thread(target=self._log_writer, name="db-log-writer", daemon=True)
+        self._log_thread.start()
+        atexit.register(self._stop_log_writer)
+    
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的连接，首次使用时创建并应用连接级 PRAGMA"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: 自动提交，批量写入用 _transaction 显式控制
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(f"""
+                PRAGMA synchronous={self.synchronous};
+                PRAGMA temp_store=MEMORY;
+                PRAGMA mmap_size=268435456;
+                PRAGMA cache_size=-65536;
+                PRAGMA busy_timeout=5000;
+                PRAGMA recursive_triggers=ON;
+            """)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        """显式事务: 成功提交，异常回滚"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def _log_writer(self):
+        """后台日志线程: 阻塞等待首条日志，随后在时间窗内攒批写入，收到 None 时写完剩余并退出"""
+        running = True
+        while running:
+            item = self._log_q.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+            while len(batch) < _LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._log_q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            
+            try:
+                with self._transaction() as conn:
+                    conn.executemany(_SQL_INSERT_LOG, batch)
+            except Exception as e:
+                self.logger.error(f"Failed to write {len(batch)} log events: {e}")
+    
+    def _stop_log_writer(self):
+        """通知日志线程写完队列中剩余日志并等待其退出"""
+        if self._log_thread.is_alive():
+            self._log_q.put(None)
+            self._log_thread.join()
+    
+    def close(self):
+        """关闭所有线程的连接"""
+        self._stop_log_writer()
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        for conn in connections:
+            try:
+                # 关闭前让 SQLite 根据本连接的查询记录更新统计信息
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except Exception as e:
+                self.logger.error(f"Failed to close connection: {e}")
+        
+        self._local = threading.local()
     
     def _ensure_database(self):
         """确保数据库存在并创建表"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.executescript("""
-                -- 订单表
-                CREATE TABLE IF NOT EXISTS orders (
-                    id TEXT PRIMARY KEY,
-                    exchange_order_id TEXT,
-                    symbol TEXT NOT NULL,
-                    side TEXT NOT NULL,
-                    price REAL NOT NULL,
-                    quantity REAL NOT NULL,
-                    status TEXT NOT NULL,
-                    grid_level TEXT NOT NULL,
-                    grid_index INTEGER NOT NULL,
-                    created_at TEXT NOT NULL,
-                    filled_at TEXT,
-                    profit REAL DEFAULT 0
-                );
-                
-                -- 交易记录表
-                CREATE TABLE IF NOT EXISTS trades (
-                    trade_id TEXT PRIMARY KEY,
-                    order_id TEXT NOT NULL,
-                    symbol TEXT NOT NULL,
-                    side TEXT NOT NULL,
-                    price REAL NOT NULL,
-                    quantity REAL NOT NULL,
-                    commission REAL DEFAULT 0,
-                    profit REAL DEFAULT 0,
-                    grid_level TEXT NOT NULL,
-                    executed_at TEXT NOT NULL
-                );
-                
-                -- 性能指标表
-                CREATE TABLE IF NOT EXISTS performance (
-                    date TEXT PRIMARY KEY,
-                    total_pnl REAL DEFAULT 0,
-                    realized_pnl REAL DEFAULT 0,
-                    unrealized_pnl REAL DEFAULT 0,
-                    total_trades INTEGER DEFAULT 0,
-                    winning_trades INTEGER DEFAULT 0,
-                    win_rate REAL DEFAULT 0,
-                    max_drawdown REAL DEFAULT 0,
-                    current_drawdown REAL DEFAULT 0,
-                    daily_return REAL DEFAULT 0,
-                    updated_at TEXT NOT NULL
-                );
-                
-                -- 系统日志表
-                CREATE TABLE IF NOT EXISTS system_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    level TEXT NOT NULL,
-                    component TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    details TEXT
-                );
-                
-                -- 网格状态表
-                CREATE TABLE IF NOT EXISTS grid_states (
-                    grid_level TEXT PRIMARY KEY,
-                    center_price REAL NOT NULL,
-                    active_orders INTEGER DEFAULT 0,
-                    integrity_percentage REAL DEFAULT 0,
-                    last_rebuild TEXT,
-                    updated_at TEXT NOT NULL
-                );
-                
-                -- 创建索引
-                CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
-                CREATE INDEX IF NOT EXISTS idx_orders_grid_level ON orders(grid_level);
-                CREATE INDEX IF NOT EXISTS idx_trades_executed_at ON trades(executed_at);
-                CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON system_logs(timestamp);
-            """)
+        conn = self._conn()
+        # 仅对尚未建表的新库生效；已有库保持原模式，incremental_vacuum 为空操作
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL 模式持久化在数据库文件中，读写互不阻塞
+        conn.execute("PRAGMA journal_mode=WAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION and self._table_exists(conn, 'orders'):
+            self._migrate_schema(conn, version)
+        
+        conn.executescript(_SQL_CREATE_TABLES)
+        conn.executescript(_SQL_CREATE_INDEXES)
+        if conn.execute("SELECT 1 FROM daily_rollup LIMIT 1").fetchone() is None:
+            conn.execute(_SQL_BACKFILL_ROLLUP)
+        conn.executescript(_SQL_CREATE_TRIGGERS)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        # 启动时按需刷新统计信息，保证复合索引被选中
+        conn.execute("PRAGMA optimize")
+    
+    @staticmethod
+    def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+        cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+    
+    def _migrate_schema(self, conn: sqlite3.Connection, version: int):
+        """旧库升级: 按新列类型重建表并拷贝数据"""
+        self.logger.info(f"Migrating database schema v{version} -> v{SCHEMA_VERSION}")
+        
+        tables = [t for t in _TIMESTAMP_COLUMNS if self._table_exists(conn, t)]
+        with self._transaction():
+            for table in tables:
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v{version}")
+            # 旧索引随旧表改名保留，删表后由 _ensure_database 重新创建
+            for statement in _SQL_CREATE_TABLES.split(';'):
+                if 'CREATE TABLE' in statement:
+                    conn.execute(statement)
+            for table in tables:
+                columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table}_v{version})")]
+                select = [
+                    _sql_iso_to_epoch_us(column)
+                    if version < 2 and column in _TIMESTAMP_COLUMNS[table] else column
+                    for column in columns
+                ]
+                conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) "
+                             f"SELECT {', '.join(select)} FROM {table}_v{version}")
+                conn.execute(f"DROP TABLE {table}_v{version}")
     
     def save_order(self, order: OrderInfo) -> bool:
         """保存订单"""
+        return self.save_orders_bulk([order])
+    
+    def save_orders_bulk(self, orders: List[OrderInfo]) -> bool:
+        """批量保存订单（单事务 executemany）"""
+        if not orders:
+            return True
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO orders 
-                    (id, exchange_order_id, symbol, side, price, quantity, status, 
-                     grid_level, grid_index, created_at, filled_at, profit)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    order.id, order.exchange_order_id, order.symbol, order.side.value,
-                    float(order.price), float(order.quantity), order.status.value,
-                    order.grid_level.value, order.grid_index, order.created_at.isoformat(),
-                    order.filled_at.isoformat() if order.filled_at else None,
-                    float(order.profit)
-                ))
+            with self._transaction() as conn:
+                conn.executemany(_SQL_INSERT_ORDER, [self._order_params(order) for order in orders])
+            self.orders_version = next(self._orders_seq)
             return True
         except Exception as e:
-            self.logger.error(f"Failed to save order: {e}")
+            self.logger.error(f"Failed to save orders: {e}")
             return False
     
-    def get_active_orders(self, grid_level: Optional[GridLevel] = None) -> List[OrderInfo]:
-        """获取活跃订单"""
+    @staticmethod
+    def _order_params(order: OrderInfo) -> tuple:
+        """订单 -> INSERT 参数"""
+        return (
+            order.id, order.exchange_order_id, order.symbol, _SIDE_VAL[order.side],
+            order.price, order.quantity, _STATUS_VAL[order.status],
+            _LEVEL_VAL[order.grid_level], order.grid_index, order.created_at,
+            order.filled_at,
+            order.profit
+        )
+    
+    def get_active_orders(self, grid_level: Optional[GridLevel] = None,
+                          statuses: Tuple[OrderStatus, ...] = ACTIVE_ORDER_STATUSES,
+                          created_before: Optional[datetime] = None) -> List[OrderInfo]:
+        """获取活跃订单（状态/创建时间过滤在 SQL 中完成）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                
-                query = "SELECT * FROM orders WHERE status IN ('NEW', 'PENDING')"
-                params = []
-                
-                if grid_level:
-                    query += " AND grid_level = ?"
-                    params.append(grid_level.value)
-                
-                query += " ORDER BY created_at DESC"
-                
-                cursor = conn.execute(query, params)
-                rows = cursor.fetchall()
-                
-                orders = []
-                for row in rows:
-                    order = OrderInfo(
-                        id=row['id'],
-                        exchange_order_id=row['exchange_order_id'],
-                        symbol=row['symbol'],
-                        side=OrderSide(row['side']),
-                        price=Decimal(str(row['price'])),
-                        quantity=Decimal(str(row['quantity'])),
-                        status=OrderStatus(row['status']),
-                        grid_level=GridLevel(row['grid_level']),
-                        grid_index=row['grid_index'],
-                        created_at=datetime.fromisoformat(row['created_at']),
-                        filled_at=datetime.fromisoformat(row['filled_at']) if row['filled_at'] else None,
-                        profit=Decimal(str(row['profit']))
-                    )
-                    orders.append(order)
-                
-                return orders
+            return list(self.iter_active_orders(grid_level, statuses, created_before))
         except Exception as e:
             self.logger.error(f"Failed to get active orders: {e}")
             return []
     
-    def update_order_status(self, order_id: str, status: OrderStatus, 
+    def iter_active_orders(self, grid_level: Optional[GridLevel] = None,
+                           statuses: Tuple[OrderStatus, ...] = ACTIVE_ORDER_STATUSES,
+                           created_before: Optional[datetime] = None) -> Iterator[OrderInfo]:
+        """逐批读取活跃订单（fetchmany 分页，惰性构造对象）"""
+        conn = self._conn()
+        
+        params = [_STATUS_VAL[status] for status in statuses]
+        if grid_level:
+            params.append(grid_level.value)
+        if created_before is not None:
+            params.append(created_before)
+        sql = _sql_select_orders(len(statuses), bool(grid_level), created_before is not None)
+        cursor = conn.execute(sql, params)
+        
+        while True:
+            rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield OrderInfo(
+                    id=row['id'],
+                    exchange_order_id=row['exchange_order_id'],
+                    symbol=row['symbol'],
+                    side=_SIDE_MAP[row['side']],
+                    price=row['price'],
+                    quantity=row['quantity'],
+                    status=_STATUS_MAP[row['status']],
+                    grid_level=_LEVEL_MAP[row['grid_level']],
+                    grid_index=row['grid_index'],
+                    created_at=row['created_at'],
+                    filled_at=row['filled_at'],
+                    profit=row['profit']
+                )
+    
+    def get_active_order_batch(self, grid_level: Optional[GridLevel] = None) -> OrderBatch:
+        """以列式 OrderBatch 获取活跃订单，不构造逐行 OrderInfo"""
+        try:
+            if grid_level:
+                cursor = self._conn().execute(_SQL_SELECT_ACTIVE_BATCH + " AND grid_level = ?",
+                                              (grid_level.value,))
+            else:
+                cursor = self._conn().execute(_SQL_SELECT_ACTIVE_BATCH)
+            rows = np.fromiter((tuple(row) for row in cursor), dtype=_ORDER_BATCH_DTYPE)
+            
+            return OrderBatch(
+                ids=rows['id'].tolist(),
+                price=np.ascontiguousarray(rows['price']),
+                quantity=np.ascontiguousarray(rows['quantity']),
+                profit=np.ascontiguousarray(rows['profit']),
+                side=np.ascontiguousarray(rows['side']),
+                grid_level=np.ascontiguousarray(rows['grid_level'])
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to get active order batch: {e}")
+            return OrderBatch.empty()
+    
+    def get_execution_stats(self, since: datetime) -> Tuple[int, int]:
+        """since 之后创建的订单数与其中失败的订单数"""
+        try:
+            total, failed = self._conn().execute(_SQL_EXECUTION_STATS, (since,)).fetchone()
+            return total, failed
+        except Exception as e:
+            self.logger.error(f"Failed to get execution stats: {e}")
+            return 0, 0
+    
+    def update_order_status(self, order_id: str, status: OrderStatus,
                            exchange_order_id: Optional[str] = None,
                            filled_at: Optional[datetime] = None,
                            profit: Optional[Decimal] = None) -> bool:
         """更新订单状态"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                updates = ["status = ?"]
-                params = [status.value]
-                
-                if exchange_order_id:
-                    updates.append("exchange_order_id = ?")
-                    params.append(exchange_order_id)
-                
-                if filled_at:
-                    updates.append("filled_at = ?")
-                    params.append(filled_at.isoformat())
-                
-                if profit is not None:
-                    updates.append("profit = ?")
-                    params.append(float(profit))
-                
-                params.append(order_id)
-                
-                query = f"UPDATE orders SET {', '.join(updates)} WHERE id = ?"
-                conn.execute(query, params)
-                
+            mask = ((exchange_order_id is not None)
+                    | (filled_at is not None) << 1
+                    | (profit is not None) << 2)
+            params = (_STATUS_VAL[status],
+                      *(v for v in (exchange_order_id, filled_at, profit) if v is not None),
+                      order_id)
+            self._conn().execute(_SQL_UPDATE_ORDER[mask], params)
+            self.orders_version = next(self._orders_seq)
+            
             return True
         except Exception as e:
             self.logger.error(f"Failed to update order status: {e}")
@@ -188,92 +613,89 @@ class DatabaseManager:
     
     def save_trade(self, trade: TradeRecord) -> bool:
         """保存交易记录"""
+        return self.save_trades_bulk([trade])
+    
+    def save_trades_bulk(self, trades: List[TradeRecord]) -> bool:
+        """批量保存交易记录（单事务 executemany）"""
+        if not trades:
+            return True
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO trades
-                    (trade_id, order_id, symbol, side, price, quantity, 
-                     commission, profit, grid_level, executed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    trade.trade_id, trade.order_id, trade.symbol, trade.side.value,
-                    float(trade.price), float(trade.quantity), float(trade.commission),
-                    float(trade.profit), trade.grid_level.value, trade.executed_at.isoformat()
-                ))
+            with self._transaction() as conn:
+                conn.executemany(_SQL_INSERT_TRADE, [self._trade_params(trade) for trade in trades])
             return True
         except Exception as e:
-            self.logger.error(f"Failed to save trade: {e}")
+            self.logger.error(f"Failed to save trades: {e}")
             return False
     
+    @staticmethod
+    def _trade_params(trade: TradeRecord) -> tuple:
+        """交易记录 -> INSERT 参数"""
+        return (
+            trade.trade_id, trade.order_id, trade.symbol, _SIDE_VAL[trade.side],
+            trade.price, trade.quantity, trade.commission,
+            trade.profit, _LEVEL_VAL[trade.grid_level], trade.executed_at
+        )
+    
     def get_trades(self, days: int = 7) -> List[TradeRecord]:
         """获取交易记录"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                
-                cutoff_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                cutoff_date = cutoff_date.replace(day=cutoff_date.day - days)
-                
-                cursor = conn.execute("""
-                    SELECT * FROM trades 
-                    WHERE executed_at >= ? 
-                    ORDER BY executed_at DESC
-                """, (cutoff_date.isoformat(),))
-                
-                trades = []
-                for row in cursor.fetchall():
-                    trade = TradeRecord(
-                        trade_id=row['trade_id'],
-                        order_id=row['order_id'],
-                        symbol=row['symbol'],
-                        side=OrderSide(row['side']),
-                        price=Decimal(str(row['price'])),
-                        quantity=Decimal(str(row['quantity'])),
-                        commission=Decimal(str(row['commission'])),
-                        profit=Decimal(str(row['profit'])),
-                        grid_level=GridLevel(row['grid_level']),
-                        executed_at=datetime.fromisoformat(row['executed_at'])
-                    )
-                    trades.append(trade)
-                
-                return trades
+            return list(self.iter_trades(days))
         except Exception as e:
             self.logger.error(f"Failed to get trades: {e}")
             return []
     
+    def iter_trades(self, days: int = 7) -> Iterator[TradeRecord]:
+        """逐批读取交易记录（fetchmany 分页，惰性构造对象）"""
+        cutoff_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+        
+        cursor = self._conn().execute(_SQL_SELECT_TRADES, (cutoff_date,))
+        
+        while True:
+            rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield TradeRecord(
+                    trade_id=row['trade_id'],
+                    order_id=row['order_id'],
+                    symbol=row['symbol'],
+                    side=_SIDE_MAP[row['side']],
+                    price=row['price'],
+                    quantity=row['quantity'],
+                    commission=row['commission'],
+                    profit=row['profit'],
+                    grid_level=_LEVEL_MAP[row['grid_level']],
+                    executed_at=row['executed_at']
+                )
+    
     def get_performance_metrics(self, target_date: Optional[date] = None) -> PerformanceMetrics:
         """获取性能指标"""
         if target_date is None:
             target_date = date.today()
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                
-                # 尝试从缓存获取
-                cursor = conn.execute(
-                    "SELECT * FROM performance WHERE date = ?",
-                    (target_date.isoformat(),)
+            # 尝试从缓存获取
+            cursor = self._conn().execute(_SQL_SELECT_PERFORMANCE, (target_date.isoformat(),))
+            row = cursor.fetchone()
+            
+            if row:
+                return PerformanceMetrics(
+                    total_pnl=row['total_pnl'],
+                    realized_pnl=row['realized_pnl'],
+                    unrealized_pnl=row['unrealized_pnl'],
+                    total_trades=row['total_trades'],
+                    winning_trades=row['winning_trades'],
+                    win_rate=row['win_rate'],
+                    max_drawdown=row['max_drawdown'],
+                    current_drawdown=row['current_drawdown'],
+                    daily_return=row['daily_return'],
+                    updated_at=row['updated_at']
                 )
-                row = cursor.fetchone()
-                
-                if row:
-                    return PerformanceMetrics(
-                        total_pnl=Decimal(str(row['total_pnl'])),
-                        realized_pnl=Decimal(str(row['realized_pnl'])),
-                        unrealized_pnl=Decimal(str(row['unrealized_pnl'])),
-                        total_trades=row['total_trades'],
-                        winning_trades=row['winning_trades'],
-                        win_rate=Decimal(str(row['win_rate'])),
-                        max_drawdown=Decimal(str(row['max_drawdown'])),
-                        current_drawdown=Decimal(str(row['current_drawdown'])),
-                        daily_return=Decimal(str(row['daily_return'])),
-                        updated_at=datetime.fromisoformat(row['updated_at'])
-                    )
-                
-                # 实时计算
-                return self._calculate_performance_metrics(target_date)
-                
+            
+            # 实时计算
+            return self._calculate_performance_metrics(target_date)
+        
         except Exception as e:
             self.logger.error(f"Failed to get performance metrics: {e}")
             return PerformanceMetrics()
@@ -281,93 +703,114 @@ class DatabaseManager:
     def _calculate_performance_metrics(self, target_date: date) -> PerformanceMetrics:
         """实时计算性能指标"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                
-                # 获取当日交易数据
-                start_date = target_date.strftime('%Y-%m-%d')
-                end_date = (target_date.replace(day=target_date.day + 1)).strftime('%Y-%m-%d')
-                
-                cursor = conn.execute("""
-                    SELECT 
-                        COUNT(*) as total_trades,
-                        SUM(CASE WHEN profit > 0 THEN 1 ELSE 0 END) as winning_trades,
-                        SUM(profit) as realized_pnl,
-                        SUM(commission) as total_commission
-                    FROM trades
-                    WHERE executed_at >= ? AND executed_at < ?
-                """, (start_date, end_date))
-                
-                row = cursor.fetchone()
-                
-                metrics = PerformanceMetrics()
-                if row and row['total_trades'] > 0:
-                    metrics.total_trades = row['total_trades']
-                    metrics.winning_trades = row['winning_trades'] or 0
-                    metrics.realized_pnl = Decimal(str(row['realized_pnl'] or 0))
-                    metrics.win_rate = metrics.calculate_win_rate()
-                
-                # 计算累计数据
-                cursor = conn.execute("SELECT SUM(profit) as total_pnl FROM trades")
-                row = cursor.fetchone()
-                if row:
-                    metrics.total_pnl = Decimal(str(row['total_pnl'] or 0))
-                
-                return metrics
-                
+            conn = self._conn()
+            
+            # 当日统计直接读汇总行，不再扫描 trades
+            cursor = conn.execute(_SQL_DAILY_ROLLUP, (target_date.isoformat(),))
+            row = cursor.fetchone()
+            
+            metrics = PerformanceMetrics()
+            if row and row['n_trades'] > 0:
+                metrics.total_trades = row['n_trades']
+                metrics.winning_trades = row['n_winners']
+                metrics.realized_pnl = row['sum_profit']
+                metrics.win_rate = metrics.calculate_win_rate()
+            
+            # 计算累计数据
+            cursor = conn.execute(_SQL_TOTAL_PNL)
+            row = cursor.fetchone()
+            if row:
+                metrics.total_pnl = Decimal(str(row['total_pnl'] or 0))
+            
+            return metrics
+        
         except Exception as e:
             self.logger.error(f"Failed to calculate performance metrics: {e}")
             return PerformanceMetrics()
     
+    def get_performance_series(self, days: int = 30) -> Dict[str, np.ndarray]:
+        """获取最近N天的性能序列，胜率/累计盈亏/回撤整列向量化计算"""
+        try:
+            cutoff = (date.today() - timedelta(days=days)).isoformat()
+            cursor = self._conn().execute(_SQL_SELECT_PERFORMANCE_SERIES, (cutoff,))
+            rows = np.fromiter((tuple(row) for row in cursor), dtype=_PERFORMANCE_SERIES_DTYPE)
+        except Exception as e:
+            self.logger.error(f"Failed to get performance series: {e}")
+            rows = np.empty(0, dtype=_PERFORMANCE_SERIES_DTYPE)
+        
+        total_trades = rows['total_trades']
+        winning_trades = rows['winning_trades']
+        win_rate = np.divide(winning_trades * 100.0, total_trades,
+                             out=np.zeros(len(rows)), where=total_trades > 0)
+        
+        cum_pnl = np.cumsum(rows['realized_pnl'])
+        drawdown = rolling_drawdown(cum_pnl)
+        
+        return {
+            'date': rows['date'],
+            'total_pnl': rows['total_pnl'],
+            'realized_pnl': rows['realized_pnl'],
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'win_rate': win_rate,
+            'cum_pnl': cum_pnl,
+            'drawdown': drawdown,
+        }
+    
     def save_performance_metrics(self, metrics: PerformanceMetrics, target_date: date) -> bool:
         """保存性能指标"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO performance
-                    (date, total_pnl, realized_pnl, unrealized_pnl, total_trades,
-                     winning_trades, win_rate, max_drawdown, current_drawdown, 
-                     daily_return, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    target_date.isoformat(), float(metrics.total_pnl),
-                    float(metrics.realized_pnl), float(metrics.unrealized_pnl),
-                    metrics.total_trades, metrics.winning_trades,
-                    float(metrics.win_rate), float(metrics.max_drawdown),
-                    float(metrics.current_drawdown), float(metrics.daily_return),
-                    metrics.updated_at.isoformat()
-                ))
+            self._conn().execute(_SQL_INSERT_PERFORMANCE, (
+                target_date.isoformat(), metrics.total_pnl,
+                metrics.realized_pnl, metrics.unrealized_pnl,
+                metrics.total_trades, metrics.winning_trades,
+                metrics.win_rate, metrics.max_drawdown,
+                metrics.current_drawdown, metrics.daily_return,
+                metrics.updated_at
+            ))
             return True
         except Exception as e:
             self.logger.error(f"Failed to save performance metrics: {e}")
             return False
     
     def log_event(self, level: str, component: str, message: str, details: Optional[dict] = None) -> bool:
-        """记录系统日志"""
+        """记录系统日志 (入队即返回，由后台线程写入)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO system_logs (timestamp, level, component, message, details)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    datetime.now().isoformat(), level, component, message,
-                    json.dumps(details) if details else None
-                ))
+            # details 在调用线程序列化 (orjson，Decimal/datetime/数据类直接支持)，避免调用方之后修改字典
+            self._log_q.put_nowait((
+                datetime.now(), level, component, message,
+                dumps_json(details).decode() if details else None
+            ))
             return True
         except Exception as e:
             self.logger.error(f"Failed to log event: {e}")
             return False
     
+    def log_events_bulk(self, events: List[Tuple[str, str, str, Optional[dict]]]) -> bool:
+        """批量记录系统日志: events 为 (level, component, message, details)，共用一个时间戳入队"""
+        timestamp = datetime.now()
+        ok = True
+        for level, component, message, details in events:
+            try:
+                self._log_q.put_nowait((
+                    timestamp, level, component, message,
+                    dumps_json(details).decode() if details else None
+                ))
+            except Exception as e:
+                self.logger.error(f"Failed to log event: {e}")
+                ok = False
+        return ok
+    
     def cleanup_old_data(self, days: int = 30):
         """清理旧数据"""
         try:
-            cutoff_date = datetime.now().replace(day=datetime.now().day - days)
+            cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._transaction() as conn:
                 # 清理旧日志
                 cursor = conn.execute(
                     "DELETE FROM system_logs WHERE timestamp < ?",
-                    (cutoff_date.isoformat(),)
+                    (cutoff_date,)
                 )
                 deleted_logs = cursor.rowcount
                 
@@ -377,17 +820,31 @@ class DatabaseManager:
                     (cutoff_date.date().isoformat(),)
                 )
                 deleted_performance = cursor.rowcount
-                
-                self.logger.info(f"Cleaned up {deleted_logs} log entries and {deleted_performance} performance records")
-                
+            
+            self.logger.info(f"Cleaned up {deleted_logs} log entries and {deleted_performance} performance records")
+            
+            # 归还删除产生的空闲页并重新收集统计信息（不持有整库 VACUUM 锁）
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+            conn.execute("ANALYZE")
+        
         except Exception as e:
             self.logger.error(f"Failed to cleanup old data: {e}")
     
-    def backup_database(self, backup_path: str) -> bool:
-        """备份数据库"""
+    def backup_database(self, backup_path: str, compact: bool = False) -> bool:
+        """备份数据库 (在线备份API，按页分批拷贝，不会读到写了一半的WAL页)
+        
+        compact=True 时使用 VACUUM INTO 生成去除空闲页的紧凑快照，目标文件不能已存在
+        """
         try:
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            conn = self._conn()
+            if compact:
+                conn.execute("VACUUM INTO ?", (backup_path,))
+            else:
+                dst = sqlite3.connect(backup_path)
+                try:
+                    conn.backup(dst, pages=1000)
+                finally:
+                    dst.close()
             self.logger.info(f"Database backed up to {backup_path}")
             return True
         except Exception as e:
@@ -397,22 +854,21 @@ class DatabaseManager:
     def get_database_stats(self) -> Dict[str, int]:
         """获取数据库统计信息"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                stats = {}
-                
-                # 各表的记录数
-                tables = ['orders', 'trades', 'performance', 'system_logs', 'grid_states']
-                for table in tables:
-                    cursor = conn.execute(f"SELECT COUNT(*) FROM {table}")
-                    stats[f"{table}_count"] = cursor.fetchone()[0]
-                
-                # 数据库文件大小
-                db_file = Path(self.db_path)
-                if db_file.exists():
-                    stats['db_size_mb'] = round(db_file.stat().st_size / 1024 / 1024, 2)
-                
-                return stats
-                
+            conn = self._conn()
+            
+            # 各表的记录数，一条语句取回
+            stats = {f"{table}_count": count for table, count in conn.execute(_SQL_TABLE_COUNTS)}
+            
+            # 数据库文件大小
+            db_file = Path(self.db_path)
+            if db_file.exists():
+                # WAL 模式下未 checkpoint 的数据在 -wal 文件中
+                wal_file = Path(f"{self.db_path}-wal")
+                size = db_file.stat().st_size + (wal_file.stat().st_size if wal_file.exists() else 0)
+                stats['db_size_mb'] = round(size / 1024 / 1024, 2)
+            
+            return stats
+        
         except Exception as e:
             self.logger.error(f"Failed to get database stats: {e}")
-            return {}
\ No newline at end of file
+            return {}
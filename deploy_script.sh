@@ -18,7 +18,7 @@ CYAN='\033[0;36m'
 NC='\033[0m' # No Color
 
 # Configuration
-PYTHON_MIN_VERSION="3.8"
+PYTHON_MIN_VERSION="3.10"
 VENV_NAME="venv"
 CONFIG_FILE="config.yaml"
 LOG_DIR="logs"
@@ -95,7 +95,7 @@ check_system_requirements() {
     # Check Python
     if ! command_exists python3; then
         print_error "Python 3 is not installed"
-        print_info "Please install Python 3.8+ from https://python.org"
+        print_info "Please install Python 3.10+ from https://python.org"
         return 1
     fi
     
@@ -1,11 +1,80 @@
 # capital_manager.py - 动态资金管理模块
 import asyncio
 import logging
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Deque, Dict, Iterable, List, Optional, Tuple
 from decimal import Decimal
-from data_models import GridLevel, OrderInfo, OrderStatus, TradingConfig
+import numpy as np
+from data_models import CapitalAllocation, GridLevel, OrderInfo, OrderStatus, TradingConfig
 from database_manager import DatabaseManager
+from metrics_kernels import rank_by_distance_desc
+
+# 资金分配使用整数定点运算: 金额以微USDT (1e-6) 计，比例以基点 (1e-4) 计
+_MICRO_EXP = 6
+_BPS = 10000
+_REBALANCE_MIN_DIFF_MICRO = 100 * 10 ** _MICRO_EXP  # 差异超过100 USDT才调整
+
+_KLINE_INTERVAL_MS = 3600 * 1000  # 1h K线
+
+# 各市场状态下的资金分配比例（基点）
+_ALLOCATION_RATIOS: Dict[str, Dict[GridLevel, int]] = {
+    # 震荡市场：平衡分配，重点高频
+    "sideways": {
+        GridLevel.HIGH_FREQ: 4000,
+        GridLevel.MAIN_TREND: 3500,
+        GridLevel.INSURANCE: 2500
+    },
+    # 趋势市场：重点主趋势层
+    "trending": {
+        GridLevel.HIGH_FREQ: 2500,
+        GridLevel.MAIN_TREND: 5000,
+        GridLevel.INSURANCE: 2500
+    },
+    # 高波动：保守策略，增加保险层
+    "high_volatility": {
+        GridLevel.HIGH_FREQ: 2000,
+        GridLevel.MAIN_TREND: 4000,
+        GridLevel.INSURANCE: 4000
+    }
+}
+
+def _clamp_insurance_ratio(ratios: Dict[GridLevel, int], max_insurance_bps: int) -> Dict[GridLevel, int]:
+    """应用保险层资金上限，超出部分转入主趋势层"""
+    clamped = dict(ratios)
+    if clamped[GridLevel.INSURANCE] > max_insurance_bps:
+        excess = clamped[GridLevel.INSURANCE] - max_insurance_bps
+        clamped[GridLevel.INSURANCE] = max_insurance_bps
+        clamped[GridLevel.MAIN_TREND] += excess
+    return clamped
+
+async def _bounded_gather(coros: Iterable[Awaitable], limit: int = 20) -> List[Any]:
+    """并发执行协程，同时进行的不超过 limit 个
+    
+    协程由 limit 个工作者按需从迭代器取出，传入生成器时不会一次性创建全部协程；
+    结果按输入顺序返回，异常作为结果返回而不中断其他任务
+    """
+    results: Dict[int, Any] = {}
+    pending = enumerate(coros)
+    
+    async def worker():
+        for index, coro in pending:
+            try:
+                results[index] = await coro
+            except Exception as e:
+                results[index] = e
+    
+    await asyncio.gather(*(worker() for _ in range(limit)))
+    return [results[index] for index in range(len(results))]
+
+def _to_micro(amount) -> int:
+    """金额 (Decimal 或字符串) 转为微USDT整数，多余小数位截断"""
+    return int(Decimal(amount).scaleb(_MICRO_EXP))
+
+def _from_micro(micro: int) -> Decimal:
+    """微USDT整数转回 Decimal 金额"""
+    return Decimal(micro).scaleb(-_MICRO_EXP)
 
 class DynamicCapitalManager:
     """动态资金管理器 - 解决保险层资金冻结问题"""
@@ -25,37 +94,79 @@ class DynamicCapitalManager:
         self.volatility_window = 168  # 7天（168小时）波动率计算窗口
         self.trend_strength_threshold = Decimal("0.15")  # 15%趋势强度阈值
         
-        # 资金使用统计
-        self.capital_allocation = {
-            GridLevel.HIGH_FREQ: Decimal("0"),
-            GridLevel.MAIN_TREND: Decimal("0"),
-            GridLevel.INSURANCE: Decimal("0")
+        # 收盘价滑动窗口 (开盘时间ms, 收盘价)，每次只拉取上次之后的K线
+        self._kline_window: Deque[Tuple[int, float]] = deque(maxlen=self.volatility_window)
+        # 窗口末根K线未变化时直接复用上次的分析结果
+        self._market_analysis_key: Optional[Tuple[int, float]] = None
+        self._market_analysis: Dict[str, any] = {}
+        
+        # 分配比例表在初始化时按保险层上限预先裁剪
+        max_insurance_bps = int(self.max_insurance_ratio * _BPS)
+        self._allocation_bps = {
+            state: _clamp_insurance_ratio(ratios, max_insurance_bps)
+            for state, ratios in _ALLOCATION_RATIOS.items()
         }
         
+        # 资金使用统计
+        self.capital_allocation = CapitalAllocation()
+        
         self.last_rebalance_time = datetime.now()
+        self._last_rebalance_mono = time.monotonic()
+        
+        # 活跃订单短期缓存: 同一轮监控各步骤共享查询结果，撤单/加单后按层级失效
+        self._active_orders_cache: Dict[GridLevel, Tuple[float, List[OrderInfo]]] = {}
+        
+        # 同时进行中的撤单请求上限
+        self._cancel_sem = asyncio.Semaphore(10)
+        
+        self._stop_event = asyncio.Event()
+        
+        # 账户信息短期缓存，避免同一轮监控内重复请求；撤单成功后失效
+        self._account_info: Optional[dict] = None
+        self._account_info_ts = 0.0
     
     async def start_monitoring(self):
         """启动资金管理监控"""
         self.logger.info("Starting dynamic capital management...")
         
-        while True:
+        while not self._stop_event.is_set():
             try:
+                # 资金占用分析的结果是再平衡的输入，先单独完成
                 await self._analyze_capital_usage()
-                await self._rebalance_capital_if_needed()
-                await self._manage_insurance_layer()
                 
-                # 每小时检查一次
-                await asyncio.sleep(3600)
+                # 再平衡与保险层管理互不依赖，并发执行，一个出错不影响另一个
+                results = await asyncio.gather(
+                    self._rebalance_capital_if_needed(),
+                    self._manage_insurance_layer(),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        self.logger.error(f"Capital management error: {result}")
+                
+                interval = 3600  # 每小时检查一次
                 
             except Exception as e:
                 self.logger.error(f"Capital management error: {e}")
-                await asyncio.sleep(600)  # 出错时10分钟后重试
+                interval = 600  # 出错时10分钟后重试
+            
+            # 等待下一轮，stop() 置位事件后立即退出
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+        
+        self.logger.info("Dynamic capital management stopped")
+    
+    def stop(self):
+        """停止资金管理监控"""
+        self._stop_event.set()
     
     async def _analyze_capital_usage(self):
         """分析资金使用情况"""
         try:
             # 获取账户信息
-            account_info = await self.binance.futures_account()
+            account_info = await self._get_account_info()
             total_balance = Decimal(account_info['totalWalletBalance'])
             available_balance = Decimal(account_info['availableBalance'])
             
@@ -72,7 +183,7 @@ class DynamicCapitalManager:
                 "available_balance": float(available_balance),
                 "frozen_capital": float(frozen_capital),
                 "frozen_ratio": float(frozen_ratio),
-                "grid_allocation": {level.value: float(amount) for level, amount in self.capital_allocation.items()}
+                "grid_allocation": self.capital_allocation.to_dict()
             }
             
             await self.db.log_event("INFO", "CapitalManager", "Capital usage analysis", capital_status)
@@ -87,21 +198,23 @@ class DynamicCapitalManager:
     async def _calculate_grid_capital_usage(self, total_balance: Decimal):
         """计算各网格层级的资金占用"""
         try:
-            for grid_level in GridLevel:
-                active_orders = self.db.get_active_orders(grid_level)
-                
-                level_capital = Decimal("0")
-                for order in active_orders:
-                    if order.status in [OrderStatus.NEW, OrderStatus.PENDING]:
-                        order_value = order.price * order.quantity
-                        level_capital += order_value
-                
-                self.capital_allocation[grid_level] = level_capital
+            # 各层级查询互不依赖，放到线程池并发执行
+            levels = list(GridLevel)
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self._get_active_orders_cached, level) for level in levels)
+            )
+            
+            debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+            for grid_level, active_orders in zip(levels, results):
+                # 查询已限定为 NEW/PENDING 状态，无需再逐单判断
+                level_capital = sum((order.price * order.quantity for order in active_orders), Decimal("0"))
                 
-                # 计算占用比例
-                usage_ratio = level_capital / total_balance if total_balance > 0 else Decimal("0")
+                self.capital_allocation[grid_level] = float(level_capital)
                 
-                self.logger.debug(f"Grid {grid_level.value} capital usage: {level_capital:.2f} USDT ({usage_ratio:.1%})")
+                # 占用比例只用于调试日志，未开启 DEBUG 时不计算也不格式化
+                if debug_enabled:
+                    usage_ratio = level_capital / total_balance if total_balance > 0 else Decimal("0")
+                    self.logger.debug(f"Grid {grid_level.value} capital usage: {level_capital:.2f} USDT ({usage_ratio:.1%})")
         
         except Exception as e:
             self.logger.error(f"Failed to calculate grid capital usage: {e}")
@@ -111,12 +224,15 @@ class DynamicCapitalManager:
         self.logger.warning(f"High frozen capital ratio detected: {frozen_ratio:.1%}")
         
         try:
+            # 两个层级的回收共用同一次行情查询
+            current_price = await self._get_current_price()
+            
             # 优先回收保险层资金
-            insurance_recovery = await self._recover_insurance_capital()
+            insurance_recovery = await self._recover_insurance_capital(current_price)
             
             # 如果保险层回收不足，考虑其他层级
             if frozen_ratio > Decimal("0.80"):  # 超过80%时更激进回收
-                main_trend_recovery = await self._recover_main_trend_capital()
+                main_trend_recovery = await self._recover_main_trend_capital(current_price)
                 
             await self.db.log_event("WARNING", "CapitalManager", 
                                    f"Capital recovery triggered due to high frozen ratio: {frozen_ratio:.1%}")
@@ -124,33 +240,14 @@ class DynamicCapitalManager:
         except Exception as e:
             self.logger.error(f"Capital recovery failed: {e}")
     
-    async def _recover_insurance_capital(self) -> Decimal:
+    async def _recover_insurance_capital(self, current_price: Decimal) -> Decimal:
         """回收保险层资金"""
         try:
-            insurance_orders = self.db.get_active_orders(GridLevel.INSURANCE)
-            
-            # 按距离当前价格远近排序，优先取消最远的订单
-            current_price = await self._get_current_price()
-            
-            # 计算每个订单与当前价格的距离
-            orders_with_distance = []
-            for order in insurance_orders:
-                distance = abs(order.price - current_price) / current_price
-                orders_with_distance.append((order, distance))
-            
-            # 按距离排序，距离最远的优先取消
-            orders_with_distance.sort(key=lambda x: x[1], reverse=True)
+            insurance_orders = self._get_active_orders_cached(GridLevel.INSURANCE)
             
-            recovered_capital = Decimal("0")
-            cancel_count = 0
-            
-            # 取消最远的50%保险层订单
-            target_cancel_count = len(orders_with_distance) // 2
-            
-            for order, distance in orders_with_distance[:target_cancel_count]:
-                if await self._cancel_order_safely(order):
-                    recovered_capital += order.price * order.quantity
-                    cancel_count += 1
+            # 按距离排序，取消最远的50%保险层订单
+            targets = self._rank_orders_by_distance(insurance_orders, current_price, len(insurance_orders) // 2)
+            cancel_count, recovered_capital = await self._cancel_orders(targets)
             
             self.logger.info(f"Recovered {recovered_capital:.2f} USDT by canceling {cancel_count} insurance orders")
             return recovered_capital
@@ -159,30 +256,14 @@ class DynamicCapitalManager:
             self.logger.error(f"Failed to recover insurance capital: {e}")
             return Decimal("0")
     
-    async def _recover_main_trend_capital(self) -> Decimal:
+    async def _recover_main_trend_capital(self, current_price: Decimal) -> Decimal:
         """回收主趋势层资金（更保守）"""
         try:
-            main_trend_orders = self.db.get_active_orders(GridLevel.MAIN_TREND)
-            current_price = await self._get_current_price()
+            main_trend_orders = self._get_active_orders_cached(GridLevel.MAIN_TREND)
             
             # 只取消距离当前价格最远的25%订单
-            orders_with_distance = []
-            for order in main_trend_orders:
-                distance = abs(order.price - current_price) / current_price
-                orders_with_distance.append((order, distance))
-            
-            orders_with_distance.sort(key=lambda x: x[1], reverse=True)
-            
-            recovered_capital = Decimal("0")
-            cancel_count = 0
-            
-            # 只取消最远的25%订单
-            target_cancel_count = len(orders_with_distance) // 4
-            
-            for order, distance in orders_with_distance[:target_cancel_count]:
-                if await self._cancel_order_safely(order):
-                    recovered_capital += order.price * order.quantity
-                    cancel_count += 1
+            targets = self._rank_orders_by_distance(main_trend_orders, current_price, len(main_trend_orders) // 4)
+            cancel_count, recovered_capital = await self._cancel_orders(targets)
             
             self.logger.info(f"Recovered {recovered_capital:.2f} USDT by canceling {cancel_count} main trend orders")
             return recovered_capital
@@ -191,42 +272,86 @@ class DynamicCapitalManager:
             self.logger.error(f"Failed to recover main trend capital: {e}")
             return Decimal("0")
     
-    async def _cancel_order_safely(self, order: OrderInfo) -> bool:
-        """安全取消订单"""
-        try:
-            if order.exchange_order_id:
-                await self.binance.futures_cancel_order(
-                    symbol=order.symbol,
-                    orderId=order.exchange_order_id
-                )
-                
-                # 更新本地状态
-                self.db.update_order_status(order.id, OrderStatus.CANCELED)
-                return True
+    async def _get_account_info(self, ttl: float = 60) -> dict:
+        """获取账户信息，ttl 秒内复用上次结果"""
+        now = time.monotonic()
+        if self._account_info is None or now - self._account_info_ts > ttl:
+            self._account_info = await self.binance.futures_account()
+            self._account_info_ts = now
+        return self._account_info
+    
+    def _get_active_orders_cached(self, grid_level: GridLevel, ttl: float = 30) -> List[OrderInfo]:
+        """获取层级活跃订单，ttl 秒内复用上次查询结果"""
+        now = time.monotonic()
+        cached = self._active_orders_cache.get(grid_level)
+        if cached is not None and now - cached[0] < ttl:
+            return cached[1]
         
-        except Exception as e:
-            self.logger.error(f"Failed to cancel order {order.id}: {e}")
-            return False
+        orders = self.db.get_active_orders(grid_level)
+        self._active_orders_cache[grid_level] = (now, orders)
+        return orders
+    
+    @staticmethod
+    def _rank_orders_by_distance(orders: List[OrderInfo], current_price: Decimal,
+                                 top_k: Optional[int] = None) -> List[OrderInfo]:
+        """按与当前价格的距离从远到近排序订单，可只取最远的 top_k 个（距离相同保持原顺序）"""
+        if not orders:
+            return []
+        
+        prices = np.fromiter((float(order.price) for order in orders), dtype=np.float64, count=len(orders))
+        # 除以当前价格不改变排序，省略
+        indices = rank_by_distance_desc(prices, float(current_price), len(orders) if top_k is None else top_k)
+        return [orders[i] for i in indices]
+    
+    async def _cancel_orders(self, orders: List[OrderInfo]) -> Tuple[int, Decimal]:
+        """并发取消一批订单，返回成功数量与释放的资金"""
+        results = await asyncio.gather(*(self._cancel_order_safely(order) for order in orders),
+                                       return_exceptions=True)
+        canceled = [order for ok, order in zip(results, orders) if ok is True]
+        return len(canceled), sum((order.price * order.quantity for order in canceled), Decimal("0"))
+    
+    async def _cancel_order_safely(self, order: OrderInfo) -> bool:
+        """安全取消订单（并发撤单数受信号量限制，避免触发交易所限频）"""
+        async with self._cancel_sem:
+            try:
+                if order.exchange_order_id:
+                    await self.binance.futures_cancel_order(
+                        symbol=order.symbol,
+                        orderId=order.exchange_order_id
+                    )
+                    
+                    # 更新本地状态
+                    self.db.update_order_status(order.id, OrderStatus.CANCELED)
+                    self._active_orders_cache.pop(order.grid_level, None)
+                    self._account_info = None
+                    return True
+            
+            except Exception as e:
+                self.logger.error(f"Failed to cancel order {order.id}: {e}")
+                return False
     
     async def _rebalance_capital_if_needed(self):
         """根据需要重新平衡资金"""
-        current_time = datetime.now()
-        time_since_rebalance = (current_time - self.last_rebalance_time).total_seconds() / 3600
-        
-        if time_since_rebalance >= self.capital_rebalance_hours:
+        # 间隔判断使用单调时钟，不受系统时间调整影响
+        now = time.monotonic()
+        if now - self._last_rebalance_mono >= self.capital_rebalance_hours * 3600:
             await self._perform_capital_rebalancing()
-            self.last_rebalance_time = current_time
+            self._last_rebalance_mono = now
+            self.last_rebalance_time = datetime.now()
     
     async def _perform_capital_rebalancing(self):
         """执行资金重新平衡"""
         try:
             self.logger.info("Starting capital rebalancing...")
             
-            # 分析市场状态
-            market_analysis = await self._analyze_market_conditions()
+            # 分析市场状态，同时获取账户信息
+            market_analysis, account_info = await asyncio.gather(
+                self._analyze_market_conditions(),
+                self._get_account_info()
+            )
             
             # 根据市场状态调整资金分配
-            new_allocation = await self._calculate_optimal_allocation(market_analysis)
+            new_allocation = self._calculate_optimal_allocation(market_analysis, account_info)
             
             # 执行资金重新分配
             await self._execute_rebalancing(new_allocation)
@@ -240,13 +365,11 @@ class DynamicCapitalManager:
         """分析市场状况"""
         try:
             # 获取历史价格数据
-            klines = await self.binance.futures_klines(
-                symbol=self.config.symbol,
-                interval='1h',
-                limit=self.volatility_window
-            )
+            prices = await self._update_kline_window()
             
-            prices = [Decimal(kline[4]) for kline in klines]  # 收盘价
+            window_key = self._kline_window[-1]
+            if window_key == self._market_analysis_key:
+                return self._market_analysis
             
             # 计算波动率
             volatility = self._calculate_volatility(prices)
@@ -257,55 +380,77 @@ class DynamicCapitalManager:
             # 判断市场状态
             market_state = self._determine_market_state(volatility, trend_strength)
             
-            return {
-                "volatility": float(volatility),
-                "trend_strength": float(trend_strength),
+            self._market_analysis = {
+                "volatility": volatility,
+                "trend_strength": trend_strength,
                 "market_state": market_state,
                 "current_price": float(prices[-1]),
                 "price_change_7d": float((prices[-1] - prices[0]) / prices[0])
             }
+            self._market_analysis_key = window_key
+            return self._market_analysis
         
         except Exception as e:
             self.logger.error(f"Market analysis failed: {e}")
             return {
-                "volatility": 0.02,
-                "trend_strength": 0.0,
+                "volatility": Decimal("0.02"),
+                "trend_strength": Decimal("0"),
                 "market_state": "sideways",
                 "current_price": 0,
                 "price_change_7d": 0
             }
     
-    def _calculate_volatility(self, prices: List[Decimal]) -> Decimal:
-        """计算价格波动率"""
-        if len(prices) < 2:
-            return Decimal("0.02")  # 默认2%波动率
+    async def _update_kline_window(self) -> np.ndarray:
+        """增量更新收盘价窗口，返回 float64 收盘价数组"""
+        window = self._kline_window
+        limit = self.volatility_window
+        if window:
+            # 从上次最后一根（可能尚未收盘）到当前K线的根数，多取一根容忍时钟偏差
+            missing = (int(time.time() * 1000) - window[-1][0]) // _KLINE_INTERVAL_MS + 2
+            if missing < limit:
+                limit = max(missing, 2)
+            else:
+                window.clear()
         
-        returns = []
-        for i in range(1, len(prices)):
-            ret = (prices[i] - prices[i-1]) / prices[i-1]
-            returns.append(ret)
+        klines = await self.binance.futures_klines(
+            symbol=self.config.symbol,
+            interval='1h',
+            limit=limit
+        )
         
-        # 计算标准差
-        if not returns:
-            return Decimal("0.02")
+        for kline in klines:
+            open_time, close = int(kline[0]), float(kline[4])
+            if window and open_time <= window[-1][0]:
+                # 上次拉取时未收盘的K线以最新收盘价覆盖
+                if open_time == window[-1][0]:
+                    window[-1] = (open_time, close)
+                continue
+            window.append((open_time, close))
         
-        mean_return = sum(returns) / len(returns)
-        variance = sum((ret - mean_return) ** 2 for ret in returns) / len(returns)
-        volatility = variance ** Decimal("0.5")
+        return np.fromiter((close for _, close in window), dtype=np.float64, count=len(window))
+    
+    def _calculate_volatility(self, prices: np.ndarray) -> Decimal:
+        """计算价格波动率"""
+        if prices.shape[0] < 2:
+            return Decimal("0.02")  # 默认2%波动率
         
-        return volatility
+        # 收益率的总体标准差
+        returns = np.diff(prices) / prices[:-1]
+        return Decimal(str(float(returns.std())))
     
-    def _calculate_trend_strength(self, prices: List[Decimal]) -> Decimal:
+    def _calculate_trend_strength(self, prices: np.ndarray) -> Decimal:
         """计算趋势强度"""
-        if len(prices) < 20:
+        if prices.shape[0] < 20:
             return Decimal("0")
         
-        # 使用简单移动平均线计算趋势
-        short_ma = sum(prices[-20:]) / 20
-        long_ma = sum(prices[-50:]) / 50 if len(prices) >= 50 else sum(prices) / len(prices)
+        # 使用简单移动平均线计算趋势（不足50根时长均线取全部数据）
+        short_ma = prices[-20:].mean()
+        long_ma = prices[-50:].mean()
+        if long_ma <= 0:
+            return Decimal("0")
         
-        trend_strength = abs(short_ma - long_ma) / long_ma if long_ma > 0 else Decimal("0")
-        return min(trend_strength, Decimal("1"))
+        trend_strength = abs(short_ma - long_ma) / long_ma
+        return Decimal(str(min(float(trend_strength), 1.0)))
     
     def _determine_market_state(self, volatility: Decimal, trend_strength: Decimal) -> str:
         """判断市场状态"""
@@ -316,83 +461,53 @@ class DynamicCapitalManager:
         else:
             return "sideways"
     
-    async def _calculate_optimal_allocation(self, market_analysis: Dict[str, any]) -> Dict[GridLevel, Decimal]:
-        """计算最优资金分配"""
+    def _calculate_optimal_allocation(self, market_analysis: Dict[str, any], account_info: dict) -> Dict[GridLevel, int]:
+        """计算最优资金分配（返回各层级目标金额，单位微USDT）"""
         market_state = market_analysis["market_state"]
-        volatility = Decimal(str(market_analysis["volatility"]))
         
         # 获取总可用资金
-        account_info = await self.binance.futures_account()
-        total_balance = Decimal(account_info['totalWalletBalance'])
-        
-        # 根据市场状态调整分配比例
-        if market_state == "sideways":
-            # 震荡市场：平衡分配，重点高频
-            allocation_ratios = {
-                GridLevel.HIGH_FREQ: Decimal("0.40"),
-                GridLevel.MAIN_TREND: Decimal("0.35"),
-                GridLevel.INSURANCE: Decimal("0.25")
-            }
-        elif market_state == "trending":
-            # 趋势市场：重点主趋势层
-            allocation_ratios = {
-                GridLevel.HIGH_FREQ: Decimal("0.25"),
-                GridLevel.MAIN_TREND: Decimal("0.50"),
-                GridLevel.INSURANCE: Decimal("0.25")
-            }
-        else:  # high_volatility
-            # 高波动：保守策略，增加保险层
-            allocation_ratios = {
-                GridLevel.HIGH_FREQ: Decimal("0.20"),
-                GridLevel.MAIN_TREND: Decimal("0.40"),
-                GridLevel.INSURANCE: Decimal("0.40")
-            }
+        total_micro = _to_micro(account_info['totalWalletBalance'])
         
-        # 应用保险层资金限制
-        if allocation_ratios[GridLevel.INSURANCE] > self.max_insurance_ratio:
-            excess = allocation_ratios[GridLevel.INSURANCE] - self.max_insurance_ratio
-            allocation_ratios[GridLevel.INSURANCE] = self.max_insurance_ratio
-            allocation_ratios[GridLevel.MAIN_TREND] += excess
+        # 根据市场状态查表得到分配比例（已应用保险层上限）
+        allocation_bps = self._allocation_bps.get(market_state, self._allocation_bps["high_volatility"])
         
         # 计算具体金额
-        target_allocation = {}
-        for level, ratio in allocation_ratios.items():
-            target_allocation[level] = total_balance * ratio
-        
-        return target_allocation
+        return {level: total_micro * bps // _BPS for level, bps in allocation_bps.items()}
     
-    async def _execute_rebalancing(self, target_allocation: Dict[GridLevel, Decimal]):
+    async def _execute_rebalancing(self, target_allocation: Dict[GridLevel, int]):
         """执行资金重新分配"""
         try:
-            for grid_level, target_amount in target_allocation.items():
-                current_amount = self.capital_allocation[grid_level]
+            for grid_level, target_micro in target_allocation.items():
+                current_micro = round(self.capital_allocation[grid_level] * 10 ** _MICRO_EXP)
                 
-                if abs(target_amount - current_amount) > Decimal("100"):  # 差异超过100 USDT才调整
-                    await self._adjust_grid_capital(grid_level, target_amount, current_amount)
+                if abs(target_micro - current_micro) > _REBALANCE_MIN_DIFF_MICRO:
+                    await self._adjust_grid_capital(grid_level, target_micro, current_micro)
         
         except Exception as e:
             self.logger.error(f"Failed to execute rebalancing: {e}")
     
-    async def _adjust_grid_capital(self, grid_level: GridLevel, target_amount: Decimal, current_amount: Decimal):
-        """调整特定网格层级的资金"""
+    async def _adjust_grid_capital(self, grid_level: GridLevel, target_micro: int, current_micro: int):
+        """调整特定网格层级的资金（金额单位微USDT，仅在下游调用与日志处转回 Decimal）"""
         try:
-            if target_amount > current_amount:
+            if target_micro > current_micro:
                 # 需要增加资金：创建更多订单
-                additional_capital = target_amount - current_amount
+                additional_capital = _from_micro(target_micro - current_micro)
                 await self._add_grid_orders(grid_level, additional_capital)
                 
             else:
                 # 需要减少资金：取消部分订单
-                excess_capital = current_amount - target_amount
+                excess_capital = _from_micro(current_micro - target_micro)
                 await self._remove_grid_orders(grid_level, excess_capital)
             
-            self.logger.info(f"Adjusted {grid_level.value} capital from {current_amount:.2f} to {target_amount:.2f}")
+            self.logger.info(f"Adjusted {grid_level.value} capital from "
+                             f"{_from_micro(current_micro):.2f} to {_from_micro(target_micro):.2f}")
         
         except Exception as e:
             self.logger.error(f"Failed to adjust grid capital for {grid_level.value}: {e}")
     
     async def _add_grid_orders(self, grid_level: GridLevel, additional_capital: Decimal):
         """为网格层级添加订单"""
+        self._active_orders_cache.pop(grid_level, None)
         # 这里需要与GridTradingEngine集成
         # 简化实现：记录需要添加的资金量
         await self.db.log_event("INFO", "CapitalManager", 
@@ -401,25 +516,22 @@ class DynamicCapitalManager:
     async def _remove_grid_orders(self, grid_level: GridLevel, excess_capital: Decimal):
         """移除网格层级的部分订单"""
         try:
-            orders = self.db.get_active_orders(grid_level)
+            orders = self._get_active_orders_cached(grid_level)
             current_price = await self._get_current_price()
             
             # 按距离当前价格排序，优先移除最远的订单
-            orders_with_distance = []
-            for order in orders:
-                distance = abs(order.price - current_price) / current_price
-                order_value = order.price * order.quantity
-                orders_with_distance.append((order, distance, order_value))
-            
-            orders_with_distance.sort(key=lambda x: x[1], reverse=True)
+            ranked_orders = self._rank_orders_by_distance(orders, current_price)
             
-            removed_capital = Decimal("0")
-            for order, distance, order_value in orders_with_distance:
-                if removed_capital >= excess_capital:
+            # 先按累计金额选出需要移除的订单，再并发撤单
+            targets = []
+            planned_capital = Decimal("0")
+            for order in ranked_orders:
+                if planned_capital >= excess_capital:
                     break
-                
-                if await self._cancel_order_safely(order):
-                    removed_capital += order_value
+                targets.append(order)
+                planned_capital += order.price * order.quantity
+            
+            _, removed_capital = await self._cancel_orders(targets)
             
             self.logger.info(f"Removed {removed_capital:.2f} USDT from {grid_level.value}")
         
@@ -437,16 +549,10 @@ class DynamicCapitalManager:
     async def _manage_insurance_layer(self):
         """管理保险层特殊逻辑"""
         try:
-            # 检查保险层订单是否长期未成交
-            insurance_orders = self.db.get_active_orders(GridLevel.INSURANCE)
-            current_time = datetime.now()
-            
+            # 检查保险层订单是否长期未成交，时间过滤由数据库完成
             stale_threshold = timedelta(days=7)  # 7天未成交视为过时
-            stale_orders = []
-            
-            for order in insurance_orders:
-                if current_time - order.created_at > stale_threshold:
-                    stale_orders.append(order)
+            stale_orders = self.db.get_active_orders(GridLevel.INSURANCE,
+                                                     created_before=datetime.now() - stale_threshold)
             
             if stale_orders:
                 await self._handle_stale_insurance_orders(stale_orders)
@@ -459,21 +565,25 @@ class DynamicCapitalManager:
         try:
             current_price = await self._get_current_price()
             
-            for order in stale_orders:
-                price_diff_percent = abs(order.price - current_price) / current_price
-                
-                # 如果订单价格与当前价格差距超过30%，考虑取消
-                if price_diff_percent > Decimal("0.30"):
-                    await self._cancel_order_safely(order)
-                    
-                    # 在更接近当前价格的位置重新下单
-                    await self._recreate_insurance_order(order, current_price)
+            await _bounded_gather(
+                (self._process_stale_order(order, current_price) for order in stale_orders),
+                limit=20
+            )
             
             self.logger.info(f"Handled {len(stale_orders)} stale insurance orders")
         
         except Exception as e:
             self.logger.error(f"Failed to handle stale insurance orders: {e}")
     
+    async def _process_stale_order(self, order: OrderInfo, current_price: Decimal):
+        """处理单个过时订单"""
+        # 如果订单价格与当前价格差距超过30%，考虑取消
+        if abs(order.price - current_price) / current_price > Decimal("0.30"):
+            await self._cancel_order_safely(order)
+            
+            # 在更接近当前价格的位置重新下单
+            await self._recreate_insurance_order(order, current_price)
+    
     async def _recreate_insurance_order(self, original_order: OrderInfo, current_price: Decimal):
         """在新位置重新创建保险层订单"""
         try:
@@ -501,7 +611,7 @@ class DynamicCapitalManager:
     def get_capital_status(self) -> Dict[str, any]:
         """获取资金管理状态"""
         return {
-            "capital_allocation": {level.value: float(amount) for level, amount in self.capital_allocation.items()},
+            "capital_allocation": self.capital_allocation.to_dict(),
             "max_insurance_ratio": float(self.max_insurance_ratio),
             "last_rebalance_time": self.last_rebalance_time.isoformat(),
             "frozen_threshold": float(self.frozen_capital_threshold)
@@ -1,126 +1,275 @@
 # enhanced_api_endpoints.py - 增强版API端点
-from flask import Flask, jsonify, request, websocket
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 import asyncio
-import json
+import functools
 import logging
+import time
+import weakref
+import numpy as np
+import orjson
+from data_models import dumps_json
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时 WebSocket 只提供 JSON 文本帧
+    msgpack = None
+
+_STATUS_CACHE_TTL = 1.0  # 状态广播帧缓存有效期 (秒)
+_WS_QUEUE_SIZE = 64       # 每个客户端的待发送帧上限
+_WS_SEND_TIMEOUT = 5.0    # 单帧发送 / 关闭连接超时 (秒)，超时视为客户端停止读取
+_METRICS_CACHE_TTL = 2.0  # 指标计算结果缓存有效期 (秒)
+_SNAPSHOT_MAX_AGE = 10.0  # 异常检测可复用的状态快照最长时效 (秒)
+
+# 静态指标与建议在导入时预先序列化，组装状态时原样嵌入
+_ENHANCED_METRICS = {
+    'grid_integrity': {
+        'overall': 92.6,
+        'high_freq': 94.2,
+        'main_trend': 89.8,
+        'insurance': 93.5
+    },
+    'capital_efficiency': 85.3,
+    'sync_health_score': 98.5,
+    'optimization_score': 87.2,
+    'multi_symbol_balance': 91.8
+}
+_ENHANCED_METRICS_JSON = dumps_json(_ENHANCED_METRICS)
+
+_AI_SUGGESTIONS_JSON = orjson.Fragment(dumps_json([
+    {
+        'type': 'capital_allocation',
+        'priority': 'high',
+        'description': '建议增加高频层资金配置5%',
+        'expected_improvement': '2.3%收益提升'
+    },
+    {
+        'type': 'grid_spacing',
+        'priority': 'medium',
+        'description': '检测到高波动期，建议增加网格间距15%',
+        'expected_improvement': '风险降低12%'
+    },
+    {
+        'type': 'symbol_rotation',
+        'priority': 'low',
+        'description': 'DOGEUSDT表现不佳，建议替换为SOLUSDT',
+        'expected_improvement': '整体收益提升2.1%'
+    }
+]))
+
+# 多币种数据的列及其数组类型 (SoA)
+_SYMBOL_COLUMNS = {
+    'status': 'U12',
+    'current_price': np.float64,
+    'allocated_capital': np.int64,
+    'active_orders': np.int64,
+    'daily_pnl': np.float64,
+    'efficiency': np.float64,
+    'risk_level': 'U8',
+}
+
+def _stream_json_array(items: Iterable) -> Iterator[bytes]:
+    """逐条序列化 JSON 数组，不在内存中拼出完整响应体"""
+    yield b'['
+    sep = b''
+    for item in items:
+        yield sep + dumps_json(item)
+        sep = b','
+    yield b']'
+
+def _ttl_cached(ttl: float):
+    """无参方法的短期缓存: ttl 秒内直接返回上次结果 (按实例保存，出错结果不缓存)"""
+    def decorator(method):
+        attr = f'_cached_{method.__name__}'
+        
+        @functools.wraps(method)
+        def wrapper(self):
+            now = time.monotonic()
+            cached = self.__dict__.get(attr)
+            if cached is not None and now - cached[0] < ttl:
+                return cached[1]
+            
+            result = method(self)
+            if 'error' not in result:
+                self.__dict__[attr] = (now, result)
+            return result
+        return wrapper
+    return decorator
+
+@dataclass(frozen=True)
+class BatchingConfig:
+    """WebSocket 广播合帧参数: 窗口内的更新合并为一帧发送"""
+    max_batch_size: int = 32
+    max_delay_ms: int = 50
+    
+    @classmethod
+    def low_latency(cls) -> 'BatchingConfig':
+        """异常告警等需要尽快送达的更新"""
+        return cls(max_delay_ms=10)
 
 class EnhancedAPIEndpoints:
     """增强版API端点 - 支持新监控面板"""
     
-    def __init__(self, trading_bot):
+    def __init__(self, trading_bot, batching: BatchingConfig = BatchingConfig()):
         self.bot = trading_bot
         self.logger = logging.getLogger(__name__)
-        self.websocket_clients = set()
+        self.batching = batching
+        self._urgent_batching = BatchingConfig.low_latency()
+        # 每个WebSocket连接一个发送队列，由独立的发送任务消费；
+        # 弱引用键，连接对象释放后条目自动消失
+        self._out_queues = weakref.WeakKeyDictionary()
+        self._msgpack_clients = weakref.WeakSet()
+        self._dropped_count = 0  # 因发送失败断开的客户端数
+        
+        # 状态各部分的序列化缓存: 名称 -> (源对象, 字节)
+        self._encoded: Dict[str, tuple] = {}
+        
+        # 最近一次状态广播帧 (monotonic 时间戳, 序列化字节)，由监控服务的状态循环写入
+        self._status_cache = (0.0, b'')
+        self._status_event = asyncio.Event()
+        
+        # 待合帧的已序列化更新及其定时刷新句柄
+        self._pending: List[bytes] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        
+        # 多币种数据按列保存，汇总统计直接在数组上计算
+        self._symbol_names, self._symbols_soa, self._symbol_issues = \
+            self._build_symbols_soa(self._get_symbols_data())
     
-    def register_routes(self, app: Flask):
+    def register_routes(self, app: FastAPI):
         """注册增强版API路由"""
         
-        @app.route('/api/enhanced_status')
+        @app.get('/api/enhanced_status')
         def enhanced_status():
             """增强版系统状态"""
-            return jsonify(self._get_enhanced_status())
+            return self._json_response(self._get_enhanced_status_bytes())
         
-        @app.route('/api/sync_monitor')
+        @app.get('/api/sync_monitor')
         def sync_monitor_status():
             """同步监控状态"""
-            return jsonify(self._get_sync_monitor_status())
+            return self._json_response(dumps_json(self._get_sync_monitor_status()))
         
-        @app.route('/api/capital_analysis')
+        @app.get('/api/capital_analysis')
         def capital_analysis():
             """资金使用分析"""
-            return jsonify(self._get_capital_analysis())
+            return self._json_response(dumps_json(self._get_capital_analysis()))
         
-        @app.route('/api/ai_suggestions')
+        @app.get('/api/ai_suggestions')
         def ai_suggestions():
             """AI优化建议"""
-            return jsonify(self._get_ai_suggestions())
+            return self._json_response(dumps_json(self._get_ai_suggestions()))
         
-        @app.route('/api/anomaly_detection')
+        @app.get('/api/anomaly_detection')
         def anomaly_detection():
             """异常检测状态"""
-            return jsonify(self._get_anomaly_detection())
+            return self._json_response(dumps_json(self._get_anomaly_detection()))
         
-        @app.route('/api/multi_symbol_detailed')
+        @app.get('/api/multi_symbol_detailed')
         def multi_symbol_detailed():
             """多币种详细状态"""
-            return jsonify(self._get_multi_symbol_detailed())
+            return StreamingResponse(self._stream_multi_symbol_detailed(),
+                                     media_type='application/json')
         
-        @app.route('/api/real_time_feed')
+        @app.get('/api/real_time_feed')
         def real_time_feed():
             """实时活动流"""
-            return jsonify(self._get_real_time_feed())
+            return StreamingResponse(_stream_json_array(self._iter_real_time_feed()),
+                                     media_type='application/json')
         
-        @app.route('/api/risk_assessment')
+        @app.get('/api/risk_assessment')
         def risk_assessment():
             """风险评估"""
-            return jsonify(self._get_risk_assessment())
+            return self._json_response(dumps_json(self._get_risk_assessment()))
         
         # 控制接口
-        @app.route('/api/optimize_insurance', methods=['POST'])
+        @app.post('/api/optimize_insurance')
         def optimize_insurance():
             """优化保险层"""
-            return jsonify(self._optimize_insurance_layer())
+            return self._json_response(dumps_json(self._optimize_insurance_layer()))
         
-        @app.route('/api/adjust_grid_density', methods=['POST'])
-        def adjust_grid_density():
+        @app.post('/api/adjust_grid_density')
+        async def adjust_grid_density(request: Request):
             """调整网格密度"""
-            data = request.json
+            data = await request.json()
             symbol = data.get('symbol')
-            return jsonify(self._adjust_grid_density(symbol))
+            return self._json_response(dumps_json(self._adjust_grid_density(symbol)))
         
-        @app.route('/api/apply_ai_suggestions', methods=['POST'])
+        @app.post('/api/apply_ai_suggestions')
         def apply_ai_suggestions():
             """应用AI建议"""
-            return jsonify(self._apply_ai_suggestions())
+            return self._json_response(dumps_json(self._apply_ai_suggestions()))
         
-        @app.route('/api/emergency_rebalance', methods=['POST'])
+        @app.post('/api/emergency_rebalance')
         def emergency_rebalance():
             """紧急资金重新平衡"""
-            return jsonify(self._emergency_rebalance())
+            return self._json_response(dumps_json(self._emergency_rebalance()))
         
         # WebSocket处理
         @app.websocket('/ws')
-        def handle_websocket():
+        async def handle_websocket(websocket: WebSocket):
             """WebSocket连接处理"""
-            try:
-                self.websocket_clients.add(websocket)
-                self._handle_websocket_connection(websocket)
-            finally:
-                self.websocket_clients.discard(websocket)
+            # 客户端声明 msgpack 子协议且已安装 msgpack 时改用二进制帧
+            binary = msgpack is not None and 'msgpack' in websocket.scope.get('subprotocols', [])
+            await websocket.accept(subprotocol='msgpack' if binary else None)
+            await self._handle_websocket_connection(websocket, binary)
     
-    def _get_enhanced_status(self) -> Dict:
-        """获取增强版系统状态"""
+    @staticmethod
+    def _json_response(payload: bytes) -> Response:
+        """已序列化的 JSON 字节直接作为响应体"""
+        return Response(payload, media_type='application/json')
+    
+    def _get_enhanced_status_bytes(self, sync_status: Optional[Dict] = None,
+                                   capital_status: Optional[Dict] = None) -> bytes:
+        """获取增强版系统状态 (JSON 字节)
+        
+        各部分分别序列化后按字节拼接，不再合并字典；TTL 缓存命中的部分复用上次的字节。
+        调用方已持有的同步/资金状态可直接传入。
+        """
         try:
             # 基础状态
-            base_status = self.bot.get_status()
+            base_status = dumps_json(self.bot.get_status())
             
             # 同步状态
-            sync_status = self._check_sync_status()
+            if sync_status is None:
+                sync_status = self._check_sync_status()
             
             # 资金状态
-            capital_status = self._analyze_capital_usage()
-            
-            # AI优化状态
-            ai_status = self._get_ai_optimization_status()
+            if capital_status is None:
+                capital_status = self._analyze_capital_usage()
             
-            # 风险评估
-            risk_assessment = self._calculate_risk_metrics()
-            
-            return {
-                **base_status,
-                'sync_status': sync_status,
-                'capital_status': capital_status,
-                'ai_status': ai_status,
-                'risk_assessment': risk_assessment,
-                'enhanced_metrics': self._calculate_enhanced_metrics(),
-                'timestamp': datetime.now().isoformat()
-            }
+            fields = b','.join((
+                b'"sync_status":' + dumps_json(sync_status),
+                b'"capital_status":' + self._encode_cached('capital_status', capital_status),
+                # AI优化状态
+                b'"ai_status":' + dumps_json(self._get_ai_optimization_status()),
+                # 风险评估
+                b'"risk_assessment":' + self._encode_cached('risk_assessment', self._calculate_risk_metrics()),
+                b'"enhanced_metrics":' + _ENHANCED_METRICS_JSON,
+                b'"ws_dropped_clients":' + str(self._dropped_count).encode(),
+                b'"timestamp":' + dumps_json(datetime.now())
+            ))
             
         except Exception as e:
             self.logger.error(f"Failed to get enhanced status: {e}")
-            return {'error': str(e)}
+            return dumps_json({'error': str(e)})
+        
+        # 基础状态对象去掉结尾的 '}' 后接上其余字段
+        if base_status == b'{}':
+            return b'{' + fields + b'}'
+        return base_status[:-1] + b',' + fields + b'}'
+    
+    def _encode_cached(self, name: str, obj) -> bytes:
+        """同一对象 (TTL 缓存命中) 复用上次的序列化结果"""
+        cached = self._encoded.get(name)
+        if cached is not None and cached[0] is obj:
+            return cached[1]
+        
+        data = dumps_json(obj)
+        self._encoded[name] = (obj, data)
+        return data
     
     def _check_sync_status(self) -> Dict:
         """检查同步状态"""
@@ -136,7 +285,7 @@ class EnhancedAPIEndpoints:
                 'status': 'healthy' if inconsistencies == 0 else 'warning',
                 'local_orders': local_orders,
                 'inconsistencies': inconsistencies,
-                'last_sync_time': last_sync.isoformat(),
+                'last_sync_time': last_sync,
                 'sync_frequency': '30s',
                 'details': {
                     'missing_orders': 0,
@@ -148,6 +297,7 @@ class EnhancedAPIEndpoints:
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
     
+    @_ttl_cached(_METRICS_CACHE_TTL)
     def _analyze_capital_usage(self) -> Dict:
         """分析资金使用情况"""
         try:
@@ -207,37 +357,20 @@ class EnhancedAPIEndpoints:
         """获取AI优化状态"""
         try:
             # 模拟AI状态（实际应该从IntelligentOptimizer获取）
+            now = datetime.now()
             return {
                 'status': 'active',
-                'last_optimization': (datetime.now() - timedelta(minutes=45)).isoformat(),
-                'next_optimization': (datetime.now() + timedelta(minutes=15)).isoformat(),
+                'last_optimization': now - timedelta(minutes=45),
+                'next_optimization': now + timedelta(minutes=15),
                 'optimizations_today': 3,
                 'success_rate': 94.2,
-                'current_suggestions': [
-                    {
-                        'type': 'capital_allocation',
-                        'priority': 'high',
-                        'description': '建议增加高频层资金配置5%',
-                        'expected_improvement': '2.3%收益提升'
-                    },
-                    {
-                        'type': 'grid_spacing',
-                        'priority': 'medium',
-                        'description': '检测到高波动期，建议增加网格间距15%',
-                        'expected_improvement': '风险降低12%'
-                    },
-                    {
-                        'type': 'symbol_rotation',
-                        'priority': 'low',
-                        'description': 'DOGEUSDT表现不佳，建议替换为SOLUSDT',
-                        'expected_improvement': '整体收益提升2.1%'
-                    }
-                ]
+                'current_suggestions': _AI_SUGGESTIONS_JSON
             }
             
         except Exception as e:
             return {'error': str(e)}
     
+    @_ttl_cached(_METRICS_CACHE_TTL)
     def _calculate_risk_metrics(self) -> Dict:
         """计算风险指标"""
         try:
@@ -268,121 +401,138 @@ class EnhancedAPIEndpoints:
     
     def _calculate_enhanced_metrics(self) -> Dict:
         """计算增强版指标"""
-        return {
-            'grid_integrity': {
-                'overall': 92.6,
-                'high_freq': 94.2,
-                'main_trend': 89.8,
-                'insurance': 93.5
-            },
-            'capital_efficiency': 85.3,
-            'sync_health_score': 98.5,
-            'optimization_score': 87.2,
-            'multi_symbol_balance': 91.8
-        }
+        return _ENHANCED_METRICS
     
-    def _get_multi_symbol_detailed(self) -> Dict:
-        """获取多币种详细状态"""
+    def _stream_multi_symbol_detailed(self) -> Iterator[bytes]:
+        """流式输出多币种详细状态: 先输出汇总字段，再逐个输出 symbols"""
+        soa = self._symbols_soa
         try:
-            symbols_data = {
-                'BTCUSDT': {
-                    'status': 'running',
-                    'current_price': 68250.00,
-                    'allocated_capital': 15000,
-                    'active_orders': 68,
-                    'daily_pnl': 234.50,
-                    'efficiency': 89.2,
-                    'risk_level': 'low'
-                },
-                'ETHUSDT': {
-                    'status': 'running',
-                    'current_price': 3842.50,
-                    'allocated_capital': 12000,
-                    'active_orders': 54,
-                    'daily_pnl': 156.30,
-                    'efficiency': 91.7,
-                    'risk_level': 'low'
-                },
-                'BNBUSDT': {
-                    'status': 'running',
-                    'current_price': 635.20,
-                    'allocated_capital': 5000,
-                    'active_orders': 32,
-                    'daily_pnl': 89.70,
-                    'efficiency': 85.4,
-                    'risk_level': 'medium'
-                },
-                'ADAUSDT': {
-                    'status': 'warning',
-                    'current_price': 1.234,
-                    'allocated_capital': 3000,
-                    'active_orders': 156,  # 订单过多
-                    'daily_pnl': -23.40,  # 负收益
-                    'efficiency': 67.8,
-                    'risk_level': 'high',
-                    'issues': ['网格密度过高', '负收益']
-                },
-                'SOLUSDT': {
-                    'status': 'running',
-                    'current_price': 178.90,
-                    'allocated_capital': 1000,
-                    'active_orders': 18,
-                    'daily_pnl': 45.20,
-                    'efficiency': 88.9,
-                    'risk_level': 'low'
-                }
-            }
-            
-            return {
-                'total_symbols': len(symbols_data),
-                'active_symbols': sum(1 for s in symbols_data.values() if s['status'] == 'running'),
-                'total_allocated': sum(s['allocated_capital'] for s in symbols_data.values()),
-                'total_daily_pnl': sum(s['daily_pnl'] for s in symbols_data.values()),
-                'symbols': symbols_data,
-                'rebalancing_needed': any('issues' in s for s in symbols_data.values())
+            summary = {
+                'total_symbols': len(self._symbol_names),
+                'active_symbols': int((soa['status'] == 'running').sum()),
+                'total_allocated': int(soa['allocated_capital'].sum()),
+                'total_daily_pnl': float(soa['daily_pnl'].sum()),
+                'rebalancing_needed': bool(soa['issues_mask'].any())
             }
-            
         except Exception as e:
-            return {'error': str(e)}
+            yield dumps_json({'error': str(e)})
+            return
+        
+        # 汇总对象去掉结尾的 '}'，接上逐个序列化的 symbols 对象；
+        # 每列 tolist() 一次转回 Python 标量，再按行还原成字典
+        yield dumps_json(summary)[:-1] + b',"symbols":{'
+        columns = {name: soa[name].tolist() for name in _SYMBOL_COLUMNS}
+        sep = b''
+        for i, symbol in enumerate(self._symbol_names):
+            data = {name: values[i] for name, values in columns.items()}
+            if symbol in self._symbol_issues:
+                data['issues'] = self._symbol_issues[symbol]
+            yield sep + dumps_json(symbol) + b':' + dumps_json(data)
+            sep = b','
+        yield b'}}'
+    
+    @staticmethod
+    def _build_symbols_soa(symbols_data: Dict[str, Dict]):
+        """字典形式的各币种数据转为列式数组: (币种列表, 列数组, 问题说明)"""
+        rows = list(symbols_data.values())
+        soa = {
+            name: np.array([row[name] for row in rows], dtype=dtype)
+            for name, dtype in _SYMBOL_COLUMNS.items()
+        }
+        soa['issues_mask'] = np.array(['issues' in row for row in rows], dtype=bool)
+        issues = {symbol: row['issues'] for symbol, row in symbols_data.items() if 'issues' in row}
+        return list(symbols_data), soa, issues
+    
+    def _get_symbols_data(self) -> Dict[str, Dict]:
+        """各币种运行数据"""
+        return {
+            'BTCUSDT': {
+                'status': 'running',
+                'current_price': 68250.00,
+                'allocated_capital': 15000,
+                'active_orders': 68,
+                'daily_pnl': 234.50,
+                'efficiency': 89.2,
+                'risk_level': 'low'
+            },
+            'ETHUSDT': {
+                'status': 'running',
+                'current_price': 3842.50,
+                'allocated_capital': 12000,
+                'active_orders': 54,
+                'daily_pnl': 156.30,
+                'efficiency': 91.7,
+                'risk_level': 'low'
+            },
+            'BNBUSDT': {
+                'status': 'running',
+                'current_price': 635.20,
+                'allocated_capital': 5000,
+                'active_orders': 32,
+                'daily_pnl': 89.70,
+                'efficiency': 85.4,
+                'risk_level': 'medium'
+            },
+            'ADAUSDT': {
+                'status': 'warning',
+                'current_price': 1.234,
+                'allocated_capital': 3000,
+                'active_orders': 156,  # 订单过多
+                'daily_pnl': -23.40,  # 负收益
+                'efficiency': 67.8,
+                'risk_level': 'high',
+                'issues': ['网格密度过高', '负收益']
+            },
+            'SOLUSDT': {
+                'status': 'running',
+                'current_price': 178.90,
+                'allocated_capital': 1000,
+                'active_orders': 18,
+                'daily_pnl': 45.20,
+                'efficiency': 88.9,
+                'risk_level': 'low'
+            }
+        }
     
-    def _get_real_time_feed(self) -> List[Dict]:
-        """获取实时活动流"""
+    def _iter_real_time_feed(self) -> Iterator[Dict]:
+        """逐条产出实时活动流"""
         try:
             # 从数据库获取最近的系统日志
             recent_logs = []  # 实际应该从数据库查询
             
-            # 模拟实时活动
+            # 模拟实时活动 (同一次响应共用一个当前时间)
+            now = datetime.now()
             activities = [
                 {
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': now,
                     'type': 'trade',
                     'level': 'success',
                     'message': 'BTCUSDT 主趋势层买单成交 @$68,250.00, 利润: +$34.50'
                 },
                 {
-                    'timestamp': (datetime.now() - timedelta(minutes=1)).isoformat(),
+                    'timestamp': now - timedelta(minutes=1),
                     'type': 'optimization',
                     'level': 'info',
                     'message': 'AI优化器调整ETHUSDT网格间距 -8%'
                 },
                 {
-                    'timestamp': (datetime.now() - timedelta(minutes=2)).isoformat(),
+                    'timestamp': now - timedelta(minutes=2),
                     'type': 'alert',
                     'level': 'warning',
                     'message': '检测到保险层资金占用率上升至32.1%'
                 },
                 {
-                    'timestamp': (datetime.now() - timedelta(minutes=3)).isoformat(),
+                    'timestamp': now - timedelta(minutes=3),
                     'type': 'sync',
                     'level': 'error',
                     'message': 'ADAUSDT订单同步异常，已自动修复'
                 }
             ]
             
-            return activities
+            yield from activities
             
         except Exception as e:
-            return [{'error': str(e)}]
+            yield {'error': str(e)}
     
     # 控制方法
     def _optimize_insurance_layer(self) -> Dict:
@@ -461,45 +611,188 @@ class EnhancedAPIEndpoints:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _handle_websocket_connection(self, ws):
-        """处理WebSocket连接"""
+    async def _handle_websocket_connection(self, ws, binary: bool = False):
+        """处理WebSocket连接 (binary 为 True 时发送 msgpack 二进制帧)"""
+        queue = asyncio.Queue(maxsize=_WS_QUEUE_SIZE)
+        self._out_queues[ws] = queue
+        if binary:
+            self._msgpack_clients.add(ws)
+        sender = asyncio.create_task(self._sender(ws, queue, binary))
         try:
             while True:
-                message = ws.receive()
+                message = await ws.receive_text()
                 if message:
-                    data = json.loads(message)
-                    if data.get('type') == 'subscribe':
+                    msg_type = self._parse_message_type(message)
+                    if msg_type == 'subscribe':
                         # 发送初始数据
-                        ws.send(json.dumps({
-                            'type': 'initial_data',
-                            'data': self._get_enhanced_status()
-                        }))
+                        frame = await self._initial_frame()
+                        if not self._enqueue(queue, self._to_msgpack(frame) if binary else frame):
+                            self._out_queues.pop(ws, None)
+        except WebSocketDisconnect:
+            pass
         except Exception as e:
             self.logger.error(f"WebSocket error: {e}")
+        finally:
+            sender.cancel()
+            try:
+                await sender
+            except asyncio.CancelledError:
+                pass
+    
+    def _parse_message_type(self, message: str) -> Optional[str]:
+        """解析客户端消息并取出 type；格式不符时返回 None (忽略该消息，不断开连接)"""
+        try:
+            data = orjson.loads(message)
+        except orjson.JSONDecodeError:
+            self.logger.debug(f"Ignoring malformed WebSocket message: {message[:100]!r}")
+            return None
+        
+        if not isinstance(data, dict) or not isinstance(data.get('type'), str):
+            return None
+        return data['type']
+    
+    def _store_status_frame(self, ts: float, payload: bytes):
+        """保存最近一次状态广播帧"""
+        self._status_cache = (ts, payload)
+        self._status_event.set()
+    
+    async def _initial_frame(self) -> bytes:
+        """订阅时的首帧: 复用最近一次状态广播帧；尚无缓存时最多等待1秒，仍没有再自行生成"""
+        if not self._status_event.is_set():
+            try:
+                await asyncio.wait_for(self._status_event.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                status = await asyncio.to_thread(self._get_enhanced_status_bytes)
+                return dumps_json({'type': 'initial_data', 'data': orjson.Fragment(status)})
+        return self._status_cache[1]
+    
+    async def _sender(self, ws, queue: asyncio.Queue, binary: bool = False):
+        """逐帧发送队列中的数据，慢客户端只阻塞自己的发送任务"""
+        try:
+            while True:
+                payload = await queue.get()
+                if payload is None:
+                    # 积压溢出: 关闭连接，客户端重连后由首帧重新同步
+                    self._dropped_count += 1
+                    await self._close_client(ws, 1013)
+                    return
+                if binary:
+                    await asyncio.wait_for(ws.send_bytes(payload), _WS_SEND_TIMEOUT)
+                else:
+                    # 面板按文本帧解析 JSON
+                    await asyncio.wait_for(ws.send_text(payload.decode()), _WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            # 客户端停止读取，发送卡在单帧上: 不再向其入队，关闭连接触发重连
+            self._dropped_count += 1
+            self._out_queues.pop(ws, None)
+            self.logger.debug(f"WebSocket client {ws.client} send timed out")
+            await self._close_client(ws, 1011)
+        except (WebSocketDisconnect, OSError, RuntimeError) as e:
+            # RuntimeError: Starlette 在连接关闭后继续发送时抛出；
+            # CancelledError 不在此捕获，正常向上传递
+            self._dropped_count += 1
+            self.logger.debug(f"WebSocket client {ws.client} dropped: {e!r}")
+    
+    async def _close_client(self, ws, code: int):
+        """关闭连接；连接已断开或关闭超时时忽略"""
+        try:
+            await asyncio.wait_for(ws.close(code=code), _WS_SEND_TIMEOUT)
+        except Exception as e:
+            self.logger.debug(f"Closing WebSocket client {ws.client} failed: {e!r}")
     
-    def broadcast_update(self, update_type: str, data: Dict):
-        """广播更新到所有WebSocket客户端"""
-        if not self.websocket_clients:
+    @staticmethod
+    def _to_msgpack(frame: bytes) -> bytes:
+        """JSON 帧转为 MessagePack 帧"""
+        return msgpack.packb(orjson.loads(frame), use_bin_type=True)
+    
+    @staticmethod
+    def _enqueue(queue: asyncio.Queue, payload: bytes) -> bool:
+        """入队；队列已满时返回 False，调用方应停止向该队列写入
+        
+        慢客户端不能逐帧丢弃 (异常告警是一次性事件)：清空积压并放入 None，
+        由发送任务关闭连接，客户端重连后重新同步。
+        """
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+            return False
+        queue.put_nowait(payload)
+        return True
+    
+    def broadcast_update(self, update_type: str, data: Optional[Dict] = None, *,
+                         raw: Optional[bytes] = None, urgent: bool = False):
+        """广播更新到所有WebSocket客户端 (raw 为已序列化的完整帧时跳过序列化)
+        
+        更新先进入合帧缓冲，满 max_batch_size 条或等待 max_delay_ms 后一并发出；
+        urgent 使用低延迟窗口。
+        """
+        if not self._out_queues:
             return
         
-        message = json.dumps({
+        # 只序列化一次，所有客户端共用同一份字节
+        message = raw if raw is not None else dumps_json({
             'type': update_type,
             'data': data,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         })
+        self._pending.append(message)
         
-        disconnected = set()
-        for client in self.websocket_clients:
-            try:
-                client.send(message)
-            except:
-                disconnected.add(client)
+        config = self._urgent_batching if urgent else self.batching
+        if len(self._pending) >= config.max_batch_size:
+            self._flush()
+            return
+        
+        # 未定时或已有定时晚于本次截止时间时重新定时
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.max_delay_ms / 1000
+        if self._flush_handle is None or self._flush_handle.when() > deadline:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush_handle = loop.call_at(deadline, self._flush)
+    
+    def _flush(self):
+        """把缓冲的更新拼成一帧入队 (单条更新直接发送，不包 batch)"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        
+        items, self._pending = self._pending, []
+        if len(items) == 1:
+            frame = items[0]
+        else:
+            frame = b'{"type":"batch","items":[' + b','.join(items) + b']}'
         
-        # 清理断开的连接
-        self.websocket_clients -= disconnected
+        # 只入队不发送，广播不会被最慢的客户端拖住；
+        # msgpack 帧每次刷新最多转换一次，所有二进制客户端共用
+        packed = None
+        overflowed = []
+        for ws, queue in self._out_queues.items():
+            if ws in self._msgpack_clients:
+                if packed is None:
+                    packed = self._to_msgpack(frame)
+                payload = packed
+            else:
+                payload = frame
+            if not self._enqueue(queue, payload):
+                overflowed.append(ws)
+        
+        # 溢出的连接即将关闭，不再接收广播
+        for ws in overflowed:
+            self._out_queues.pop(ws, None)
 
 
 # enhanced_monitoring_service.py - 增强版监控服务
+@dataclass(slots=True)
+class StatusSnapshot:
+    """状态广播时的同步/资金/网格检查结果，供异常检测复用"""
+    sync: Dict
+    capital: Dict
+    metrics: Dict
+    ts: float
+
 class EnhancedMonitoringService:
     """增强版监控服务 - 整合所有监控功能"""
     
@@ -514,6 +807,14 @@ class EnhancedMonitoringService:
         self.intelligent_optimizer = None
         self.multi_symbol_manager = None
         
+        # 状态循环产出、异常检测消费的共享快照
+        self._snapshot: Optional[StatusSnapshot] = None
+        self._snapshot_event = asyncio.Event()
+        
+        # 监控循环任务及停止信号
+        self._tasks: List[asyncio.Task] = []
+        self._stop_event = asyncio.Event()
+        
     async def initialize(self):
         """初始化监控服务"""
         try:
@@ -542,61 +843,120 @@ class EnhancedMonitoringService:
     
     async def _start_monitoring_loops(self):
         """启动各种监控循环"""
-        # 启动实时状态广播
-        asyncio.create_task(self._broadcast_status_updates())
-        
-        # 启动异常检测
-        asyncio.create_task(self._anomaly_detection_loop())
-        
-        # 启动性能监控
-        asyncio.create_task(self._performance_monitoring_loop())
+        self._tasks = [
+            # 启动实时状态广播
+            asyncio.create_task(self._broadcast_status_updates()),
+            
+            # 启动异常检测
+            asyncio.create_task(self._anomaly_detection_loop()),
+            
+            # 启动性能监控
+            asyncio.create_task(self._performance_monitoring_loop())
+        ]
+    
+    async def stop(self):
+        """停止监控服务，等待各循环退出"""
+        self._stop_event.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _wait_stop(self, timeout: float):
+        """等待 timeout 秒，收到停止信号时立即返回"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
     
     async def _broadcast_status_updates(self):
         """广播状态更新"""
-        while True:
+        while not self._stop_event.is_set():
+            interval = 5  # 每5秒广播一次
             try:
-                # 收集状态更新
-                status_update = self.api_endpoints._get_enhanced_status()
+                # 1秒内复用已序列化的状态帧
+                now = time.monotonic()
+                ts, payload = self.api_endpoints._status_cache
+                if now - ts >= _STATUS_CACHE_TTL:
+                    # 状态收集含同步的 bot/数据库调用，放到线程中执行，不阻塞事件循环
+                    payload = await asyncio.to_thread(self._build_status_frame)
+                    self.api_endpoints._store_status_frame(now, payload)
+                    if self._snapshot is not None:
+                        self._snapshot_event.set()
                 
                 # 广播到WebSocket客户端
-                self.api_endpoints.broadcast_update('status_update', status_update)
-                
-                await asyncio.sleep(5)  # 每5秒广播一次
+                self.api_endpoints.broadcast_update('status_update', raw=payload)
                 
             except Exception as e:
                 self.logger.error(f"Status broadcast error: {e}")
-                await asyncio.sleep(10)
+                interval = 10
+            
+            await self._wait_stop(interval)
+    
+    def _build_status_frame(self) -> bytes:
+        """收集增强版状态并序列化为 status_update 帧，同时更新共享快照"""
+        snapshot = self._take_snapshot()
+        status = self.api_endpoints._get_enhanced_status_bytes(snapshot.sync, snapshot.capital)
+        return dumps_json({
+            'type': 'status_update',
+            'data': orjson.Fragment(status),
+            'timestamp': datetime.now()
+        })
+    
+    def _take_snapshot(self) -> StatusSnapshot:
+        """直接执行三项检查生成快照 (状态循环的快照缺失或过期时使用)"""
+        self._snapshot = StatusSnapshot(
+            sync=self.api_endpoints._check_sync_status(),
+            capital=self.api_endpoints._analyze_capital_usage(),
+            metrics=self.api_endpoints._calculate_enhanced_metrics(),
+            ts=time.monotonic()
+        )
+        return self._snapshot
     
     async def _anomaly_detection_loop(self):
         """异常检测循环"""
-        while True:
+        # 等待状态循环产出第一份快照 (或停止信号)；超时则由检测时自行生成
+        waiters = [asyncio.ensure_future(self._snapshot_event.wait()),
+                   asyncio.ensure_future(self._stop_event.wait())]
+        await asyncio.wait(waiters, timeout=30, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+        
+        while not self._stop_event.is_set():
+            interval = 30  # 每30秒检测一次
             try:
                 # 检测各种异常
                 anomalies = await self._detect_anomalies()
                 
                 if anomalies:
                     # 广播异常警报
-                    self.api_endpoints.broadcast_update('anomaly_detected', anomalies)
+                    self.api_endpoints.broadcast_update('anomaly_detected', anomalies, urgent=True)
                     
-                    # 记录到数据库
-                    await self.bot.db.log_event(
+                    # 记录到数据库 (只入队，由后台线程写入)
+                    self.bot.db.log_event(
                         "WARNING", "EnhancedMonitoring",
                         f"Detected {len(anomalies)} anomalies",
                         anomalies
                     )
                 
-                await asyncio.sleep(30)  # 每30秒检测一次
-                
             except Exception as e:
                 self.logger.error(f"Anomaly detection error: {e}")
-                await asyncio.sleep(60)
+                interval = 60
+            
+            await self._wait_stop(interval)
     
     async def _detect_anomalies(self) -> List[Dict]:
-        """检测异常"""
+        """检测异常 (在线程中执行，不阻塞事件循环)"""
+        return await asyncio.to_thread(self._collect_anomalies)
+    
+    def _collect_anomalies(self) -> List[Dict]:
+        """逐项检查资金、同步与网格状态 (优先复用状态循环的快照)"""
         anomalies = []
         
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.ts > _SNAPSHOT_MAX_AGE:
+            snapshot = self._take_snapshot()
+        
         # 检测资金异常
-        capital_status = self.api_endpoints._analyze_capital_usage()
+        capital_status = snapshot.capital
         if capital_status.get('frozen_ratio', 0) > 0.8:
             anomalies.append({
                 'type': 'capital_freeze',
@@ -606,7 +966,7 @@ class EnhancedMonitoringService:
             })
         
         # 检测同步异常
-        sync_status = self.api_endpoints._check_sync_status()
+        sync_status = snapshot.sync
         if sync_status.get('inconsistencies', 0) > 0:
             anomalies.append({
                 'type': 'sync_inconsistency',
@@ -616,7 +976,7 @@ class EnhancedMonitoringService:
             })
         
         # 检测网格异常
-        grid_metrics = self.api_endpoints._calculate_enhanced_metrics()
+        grid_metrics = snapshot.metrics
         if grid_metrics['grid_integrity']['overall'] < 80:
             anomalies.append({
                 'type': 'grid_integrity',
@@ -629,32 +989,34 @@ class EnhancedMonitoringService:
     
     async def _performance_monitoring_loop(self):
         """性能监控循环"""
-        while True:
+        while not self._stop_event.is_set():
+            interval = 300  # 每5分钟更新一次
             try:
                 # 监控系统性能
                 performance_metrics = await self._collect_performance_metrics()
                 
-                # 更新性能数据
-                await self.bot.db.save_performance_metrics(
-                    performance_metrics, 
+                # 更新性能数据 (SQLite 写入为阻塞调用，放到线程中执行)
+                await asyncio.to_thread(
+                    self.bot.db.save_performance_metrics,
+                    performance_metrics,
                     datetime.now().date()
                 )
                 
-                await asyncio.sleep(300)  # 每5分钟更新一次
-                
             except Exception as e:
                 self.logger.error(f"Performance monitoring error: {e}")
-                await asyncio.sleep(600)
+                interval = 600
+            
+            await self._wait_stop(interval)
     
     async def _collect_performance_metrics(self):
         """收集性能指标"""
         # 这里应该收集各种性能指标
         # 返回PerformanceMetrics对象
-        return self.bot.db.get_performance_metrics()
+        return await asyncio.to_thread(self.bot.db.get_performance_metrics)
 
 
 # 集成到主程序的示例
-def integrate_enhanced_monitoring(trading_bot, web_app):
+def integrate_enhanced_monitoring(trading_bot, web_app: FastAPI):
     """集成增强版监控到主程序"""
     
     # 创建增强版监控服务
@@ -663,7 +1025,16 @@ def integrate_enhanced_monitoring(trading_bot, web_app):
     # 注册API路由
     monitoring_service.api_endpoints.register_routes(web_app)
     
-    # 启动监控服务
-    asyncio.create_task(monitoring_service.initialize())
+    # 服务器事件循环启动后再启动监控服务
+    web_app.on_event('startup')(monitoring_service.initialize)
+    web_app.on_event('shutdown')(monitoring_service.stop)
+    
+    return monitoring_service
+
+def run_enhanced_api(trading_bot, host: str = '0.0.0.0', port: int = 8080):
+    """以 uvicorn (uvloop + httptools) 运行增强版API"""
+    import uvicorn
     
-    return monitoring_service
\ No newline at end of file
+    app = FastAPI(title="Enhanced Grid Trading API")
+    integrate_enhanced_monitoring(trading_bot, app)
+    uvicorn.run(app, host=host, port=port, loop='uvloop', http='httptools')
\ No newline at end of file
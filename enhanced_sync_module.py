@@ -1,12 +1,39 @@
 # sync_monitor.py - 实时同步与异常检测模块
 import asyncio
+import itertools
 import logging
+import random
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
+from typing import AbstractSet, Dict, List, Optional, Set
 from decimal import Decimal
-from data_models import OrderInfo, OrderStatus, OrderSide
+import numpy as np
+from data_models import OrderInfo, OrderStatus, OrderSide, TradeRecord, ORDER_STATUS_CODES
 from database_manager import DatabaseManager
 
+# 事件日志攒批条数
+_EVENT_BATCH_SIZE = 50
+
+_PENDING_CODE = ORDER_STATUS_CODES[OrderStatus.PENDING]
+
+# 交易所订单状态分类 (frozenset 成员判断为一次哈希查找)
+_EXCHANGE_OPEN_STATUSES = frozenset(('NEW', 'PARTIALLY_FILLED'))
+_EXCHANGE_CLOSED_STATUSES = frozenset(('CANCELED', 'EXPIRED'))
+
+# 交易记录补录使用的费率与利润估算系数
+_FEE_RATE = Decimal("0.001")       # 0.1% 手续费
+_PROFIT_MULT = Decimal("1.005")    # 买单成交后 0.5% 利润预期
+_SELL_MARGIN = Decimal("0.005")    # 卖单成交已实现 0.5% 利润
+_ZERO = Decimal("0")
+
+# 自适应同步间隔范围 (秒)
+_MIN_SYNC_INTERVAL = 5
+_MAX_SYNC_INTERVAL = 120
+
+# 监控异常后的退避上限 (秒)
+_MAX_BACKOFF = 120
+
 class OrderSyncMonitor:
     """订单同步监控器 - 解决系统状态与交易所不一致问题"""
     
@@ -17,7 +44,7 @@ class OrderSyncMonitor:
         
         # 同步状态追踪
         self.last_sync_time = datetime.now()
-        self.sync_interval = 30  # 30秒同步一次
+        self.sync_interval = 30  # 初始30秒同步一次，之后按不一致情况在 5~120 秒间调整
         self.inconsistency_count = 0
         self.max_inconsistency = 5  # 最大允许不一致次数
         
@@ -25,150 +52,366 @@ class OrderSyncMonitor:
         self.order_timeout_minutes = 60  # 订单超时时间
         self.price_deviation_percent = Decimal("0.05")  # 5% 价格偏差告警
         
+        # 同时进行中的交易所查询上限 (受交易所请求权重限制)
+        self._request_sem = asyncio.Semaphore(8)
+        
+        # 交易所开放订单镜像，由用户数据流 ORDER_TRADE_UPDATE 事件增量维护；
+        # 全量查询 open orders 只作为定期对账
+        self._exchange_orders: Dict[str, dict] = {}
+        self._user_stream_task: Optional[asyncio.Task] = None
+        self._stream_connected = False
+        self.last_full_sync: Optional[datetime] = None
+        self.full_sync_interval = timedelta(minutes=5)
+        self._last_inconsistency_count = 0
+        # 上一轮的不一致项 (类别, 订单号)，间隔只随新出现的不一致收紧
+        self._previous_inconsistencies: Set[tuple] = set()
+        
+        # 活跃订单列式缓存 (SoA) 及其对应的订单列表
+        self._soa: Dict[str, np.ndarray] = {}
+        self._soa_source: Optional[List[OrderInfo]] = None
+        
+        # 同步补录交易记录的序号，与纳秒时间戳组成 trade_id，避免同一时刻批量补录时冲突
+        self._trade_seq = itertools.count()
+        
+        # 连续失败时的退避基数 (秒)，成功一轮后复位
+        self._backoff = 1
+        
+        # 本轮产生的事件日志，攒满或每轮结束时一次性提交
+        self._event_queue: List[tuple] = []
+        
     async def start_monitoring(self):
         """启动持续监控"""
         self.logger.info("Starting order sync monitoring...")
+        self._user_stream_task = asyncio.create_task(self._run_user_stream())
         
+        try:
+            while True:
+                try:
+                    # 间隔按单调时钟从本轮开始计算，不受系统时间调整影响，也不随处理耗时漂移
+                    tick_start = time.monotonic()
+                    now = datetime.now()
+                    
+                    # 本轮同步与异常检测共用一次数据库查询结果与当前时间
+                    active_orders = await self._get_local_active_orders()
+                    closed_ids = await self._sync_order_states(active_orders, now)
+                    if closed_ids:
+                        # 本轮已同步为成交 / 撤销的订单不再参与异常检测
+                        active_orders = [order for order in active_orders if order.id not in closed_ids]
+                    await self._detect_anomalies(active_orders, now)
+                    self._flush_events()
+                    self._backoff = 1
+                    await asyncio.sleep(max(0.0, tick_start + self.sync_interval - time.monotonic()))
+                    
+                except Exception as e:
+                    # 指数退避 + 全抖动，避免多个实例在限频时同步重试
+                    delay = random.uniform(0, min(self.sync_interval * 4, self._backoff))
+                    self._backoff = min(self._backoff * 2, _MAX_BACKOFF)
+                    self.logger.error(f"Sync monitoring error: {e}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self._user_stream_task.cancel()
+            self._flush_events()
+    
+    def _queue_event(self, level: str, message: str, details: Optional[dict] = None):
+        """事件日志入队，攒满一批时立即提交"""
+        self._event_queue.append((level, "SyncMonitor", message, details))
+        if len(self._event_queue) >= _EVENT_BATCH_SIZE:
+            self._flush_events()
+    
+    def _flush_events(self):
+        """提交已入队的事件日志"""
+        if not self._event_queue:
+            return
+        batch, self._event_queue = self._event_queue, []
+        self.db.log_events_bulk(batch)
+    
+    async def _run_user_stream(self):
+        """订阅合约用户数据流，断线后重连"""
+        from binance import BinanceSocketManager
+        
+        socket_manager = BinanceSocketManager(self.binance)
         while True:
             try:
-                await self._sync_order_states()
-                await self._detect_anomalies()
-                await asyncio.sleep(self.sync_interval)
-                
+                async with socket_manager.futures_user_socket() as stream:
+                    self._stream_connected = True
+                    # 连接建立前的事件可能已丢失，下一轮先全量对账
+                    self.last_full_sync = None
+                    while True:
+                        self._apply_user_event(await stream.recv())
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                self.logger.error(f"Sync monitoring error: {e}")
-                await asyncio.sleep(10)
+                self.logger.warning(f"User data stream disconnected: {e}")
+            finally:
+                self._stream_connected = False
+            
+            await asyncio.sleep(5)
     
-    async def _sync_order_states(self):
-        """同步订单状态"""
+    def _apply_user_event(self, msg: dict):
+        """按 ORDER_TRADE_UPDATE 事件更新开放订单镜像"""
+        event_type = msg.get('e')
+        if event_type == 'error':
+            # 数据流出错，镜像可能不完整
+            self.last_full_sync = None
+            return
+        if event_type != 'ORDER_TRADE_UPDATE':
+            return
+        
+        order = msg['o']
+        order_id = str(order['i'])
+        if order['X'] in _EXCHANGE_OPEN_STATUSES:
+            self._exchange_orders[order_id] = {
+                'orderId': order['i'],
+                'symbol': order['s'],
+                'side': order['S'],
+                'status': order['X'],
+                'price': order['p'],
+                'origQty': order['q'],
+                'executedQty': order['z'],
+                'avgPrice': order['ap']
+            }
+        else:
+            self._exchange_orders.pop(order_id, None)
+    
+    def _needs_full_sync(self, now: datetime) -> bool:
+        """数据流未连接、对账到期或同步失败次数上升时需要全量查询开放订单"""
+        return (not self._stream_connected
+                or self.last_full_sync is None
+                or now - self.last_full_sync > self.full_sync_interval
+                or self.inconsistency_count > self._last_inconsistency_count)
+    
+    async def _sync_order_states(self, local_orders: Optional[List[OrderInfo]] = None,
+                                 now: Optional[datetime] = None) -> Set[str]:
+        """同步订单状态 (local_orders / now 未传入时自行查询 / 取当前时间)
+        
+        返回交易所已不再开放、本轮按历史订单处理过的本地订单 id。
+        """
+        if now is None:
+            now = datetime.now()
         try:
-            # 获取本地活跃订单
-            local_orders = await self._get_local_active_orders()
-            local_order_ids = {order.exchange_order_id for order in local_orders if order.exchange_order_id}
+            if self._needs_full_sync(now):
+                if local_orders is None:
+                    # 本地活跃订单与交易所开放订单互不依赖，同时获取
+                    local_orders, exchange_orders = await asyncio.gather(
+                        self._get_local_active_orders(),
+                        self.binance.futures_get_open_orders()
+                    )
+                else:
+                    exchange_orders = await self.binance.futures_get_open_orders()
+                # 全量结果重建镜像
+                self._exchange_orders = {str(order['orderId']): order for order in exchange_orders}
+                self.last_full_sync = now
+                self._last_inconsistency_count = self.inconsistency_count
+            elif local_orders is None:
+                local_orders = await self._get_local_active_orders()
             
-            # 获取交易所开放订单
-            exchange_orders = await self.binance.futures_get_open_orders()
-            exchange_order_ids = {str(order['orderId']) for order in exchange_orders}
+            # 取镜像副本，处理期间数据流事件不影响本轮比对
+            exchange_by_id = dict(self._exchange_orders)
+            # 本地订单按交易所订单号索引一次，键视图即订单号集合
+            local_by_id = {order.exchange_order_id: order for order in local_orders if order.exchange_order_id}
             
             # 检测状态不一致
             inconsistencies = await self._detect_state_inconsistencies(
-                local_orders, local_order_ids, exchange_order_ids
+                local_orders, local_by_id, exchange_by_id.keys(), now
             )
             
+            closed_ids = set()
             if inconsistencies:
-                await self._handle_inconsistencies(inconsistencies)
+                await self._handle_inconsistencies(inconsistencies, exchange_by_id, now)
+                closed_ids = {order.id for order in inconsistencies['local_missing']}
+            self._adapt_sync_interval(self._count_new_inconsistencies(inconsistencies))
             
             # 更新同步时间
-            self.last_sync_time = datetime.now()
-            self.logger.debug(f"Sync completed. Local: {len(local_order_ids)}, Exchange: {len(exchange_order_ids)}")
+            self.last_sync_time = now
+            self.logger.debug(f"Sync completed. Local: {len(local_by_id)}, Exchange: {len(exchange_by_id)}")
+            return closed_ids
             
         except Exception as e:
             self.logger.error(f"Failed to sync order states: {e}")
             self.inconsistency_count += 1
+            return set()
+    
+    def _count_new_inconsistencies(self, inconsistencies: Dict[str, List]) -> int:
+        """与上一轮相比新出现的不一致项数；手动挂单、长期未成交等持续存在的项不重复计数"""
+        current = {
+            (kind, item.id if isinstance(item, OrderInfo) else item)
+            for kind, items in inconsistencies.items()
+            for item in items
+        }
+        new = current - self._previous_inconsistencies
+        self._previous_inconsistencies = current
+        return len(new)
+    
+    def _adapt_sync_interval(self, found: int):
+        """发现新的不一致时缩短同步间隔，平稳时逐步放宽"""
+        if found:
+            self.sync_interval = max(_MIN_SYNC_INTERVAL, self.sync_interval // 2)
+        else:
+            self.sync_interval = min(_MAX_SYNC_INTERVAL, int(self.sync_interval * 1.25))
     
     async def _get_local_active_orders(self) -> List[OrderInfo]:
-        """获取本地活跃订单"""
-        return self.db.get_active_orders()
+        """获取本地活跃订单 (SQLite 查询为阻塞调用，放到线程中执行)"""
+        return await asyncio.to_thread(self.db.get_active_orders)
     
-    async def _detect_state_inconsistencies(self, local_orders: List[OrderInfo], 
-                                          local_ids: Set[str], 
-                                          exchange_ids: Set[str]) -> Dict[str, List]:
-        """检测状态不一致"""
+    def _order_columns(self, orders: List[OrderInfo]) -> Dict[str, np.ndarray]:
+        """活跃订单的列式表示，同一订单列表只构建一次"""
+        if self._soa_source is not orders:
+            count = len(orders)
+            self._soa = {
+                'price': np.fromiter((float(order.price) for order in orders),
+                                     dtype=np.float64, count=count),
+                'created': np.array([order.created_at for order in orders], dtype='datetime64[us]'),
+                'status': np.fromiter((ORDER_STATUS_CODES[order.status] for order in orders),
+                                      dtype=np.uint8, count=count)
+            }
+            self._soa_source = orders
+        return self._soa
+    
+    async def _detect_state_inconsistencies(self, local_orders: List[OrderInfo],
+                                          local_by_id: Dict[str, OrderInfo],
+                                          exchange_ids: AbstractSet[str],
+                                          now: Optional[datetime] = None) -> Dict[str, List]:
+        """检测状态不一致 (local_by_id 为按交易所订单号索引的本地订单); 两侧订单号一致且没有超时订单时返回空字典"""
+        # 超时订单: 在列式缓存上按创建时间与状态整列筛选
+        timeout_threshold = (now or datetime.now()) - timedelta(minutes=self.order_timeout_minutes)
+        columns = self._order_columns(local_orders)
+        timed_out = np.flatnonzero((columns['created'] < np.datetime64(timeout_threshold))
+                                   & (columns['status'] == _PENDING_CODE))
+        
+        local_ids = local_by_id.keys()
+        if not timed_out.size and not (local_ids ^ exchange_ids):
+            return {}
+        
         inconsistencies = {
             'local_missing': [],      # 本地有但交易所没有（可能已成交或被撤销）
             'exchange_extra': [],     # 交易所有但本地没有（可能是手动下单）
             'status_mismatch': [],    # 状态不匹配
-            'timeout_orders': []      # 超时订单
+            'timeout_orders': [local_orders[i] for i in timed_out]  # 超时订单
         }
         
-        # 检查本地订单在交易所的状态
-        for order in local_orders:
-            if not order.exchange_order_id:
-                continue
-                
-            # 检查是否在交易所存在
-            if order.exchange_order_id not in exchange_ids:
-                inconsistencies['local_missing'].append(order)
-        
-        # 检查交易所额外订单
-        untracked_ids = exchange_ids - local_ids
-        if untracked_ids:
-            inconsistencies['exchange_extra'] = list(untracked_ids)
-        
-        # 检查超时订单
-        timeout_threshold = datetime.now() - timedelta(minutes=self.order_timeout_minutes)
-        for order in local_orders:
-            if order.created_at < timeout_threshold and order.status == OrderStatus.PENDING:
-                inconsistencies['timeout_orders'].append(order)
+        # 本地有但交易所没有 / 交易所有但本地没有，均为集合差
+        missing_ids = local_ids - exchange_ids
+        inconsistencies['local_missing'] = [local_by_id[order_id] for order_id in missing_ids]
+        inconsistencies['exchange_extra'] = list(exchange_ids - local_ids)
         
         return inconsistencies
     
-    async def _handle_inconsistencies(self, inconsistencies: Dict[str, List]):
-        """处理状态不一致"""
+    async def _handle_inconsistencies(self, inconsistencies: Dict[str, List],
+                                      exchange_orders: Dict[str, dict],
+                                      now: Optional[datetime] = None):
+        """处理状态不一致 (exchange_orders 为本轮已获取的交易所开放订单，按订单号索引)"""
         try:
-            # 处理本地有但交易所没有的订单
+            # 处理本地有但交易所没有的订单: 每个币种只查询一次历史订单
+            missing_by_symbol = defaultdict(list)
             for order in inconsistencies['local_missing']:
-                await self._handle_missing_order(order)
+                missing_by_symbol[order.symbol].append(order)
             
-            # 处理交易所额外订单
-            for order_id in inconsistencies['exchange_extra']:
-                await self._handle_extra_order(order_id)
-            
-            # 处理超时订单
-            for order in inconsistencies['timeout_orders']:
-                await self._handle_timeout_order(order)
+            # 三类处理并发执行，交易所请求数由 _request_sem 限制
+            results = await asyncio.gather(
+                *(self._handle_missing_orders(symbol, orders, now)
+                  for symbol, orders in missing_by_symbol.items()),
+                
+                # 处理交易所额外订单
+                *(self._handle_extra_order(order_id, exchange_orders[order_id])
+                  for order_id in inconsistencies['exchange_extra']),
+                
+                # 处理超时订单
+                *(self._handle_timeout_order(order, exchange_orders.get(order.exchange_order_id))
+                  for order in inconsistencies['timeout_orders']),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    self.logger.error(f"Inconsistency handler failed: {result}")
             
             # 记录不一致事件
             if any(inconsistencies.values()):
-                await self.db.log_event("WARNING", "SyncMonitor", 
-                                       "Order state inconsistencies detected", 
-                                       inconsistencies)
+                self._queue_event("WARNING", "Order state inconsistencies detected",
+                                 self._summarize_inconsistencies(inconsistencies))
                 
         except Exception as e:
             self.logger.error(f"Failed to handle inconsistencies: {e}")
     
-    async def _handle_missing_order(self, order: OrderInfo):
-        """处理缺失订单（可能已成交）"""
+    @staticmethod
+    def _summarize_inconsistencies(inconsistencies: Dict[str, List]) -> Dict[str, List]:
+        """日志载荷: 订单只保留 (id, symbol, side, price, quantity)"""
+        return {
+            key: [(item.id, item.symbol, item.side, item.price, item.quantity)
+                  if isinstance(item, OrderInfo) else item for item in items]
+            for key, items in inconsistencies.items()
+        }
+    
+    async def _handle_missing_orders(self, symbol: str, orders: List[OrderInfo],
+                                     now: Optional[datetime] = None):
+        """同一币种的缺失订单: 批量取回历史后并发处理"""
+        history = await self._get_order_history(symbol, orders)
+        await asyncio.gather(*(
+            self._handle_missing_order(order, history.get(order.exchange_order_id), now)
+            for order in orders
+        ))
+    
+    async def _get_order_history(self, symbol: str, orders: List[OrderInfo]) -> Dict[str, dict]:
+        """一次请求取回这些订单创建以来该币种的全部订单，按订单号索引"""
+        # allOrders 按下单时间过滤，从最早的一笔开始才能覆盖全部缺失订单
+        start_time = min(order.created_at for order in orders)
         try:
-            # 查询订单详细信息
-            order_detail = await self.binance.futures_get_order(
-                symbol=order.symbol,
-                orderId=order.exchange_order_id
-            )
-            
-            if order_detail['status'] == 'FILLED':
-                # 订单已成交，更新本地状态
-                filled_quantity = Decimal(order_detail['executedQty'])
-                avg_price = Decimal(order_detail['avgPrice'])
-                
-                await self.db.update_order_status(
-                    order.id, OrderStatus.FILLED,
-                    filled_at=datetime.now()
+            async with self._request_sem:
+                history = await self.binance.futures_get_all_orders(
+                    symbol=symbol,
+                    startTime=int(start_time.timestamp() * 1000),
+                    limit=1000
                 )
-                
-                # 创建交易记录
-                trade_id = f"sync_trade_{order.id}_{int(datetime.now().timestamp())}"
-                await self._create_trade_record(trade_id, order, filled_quantity, avg_price)
-                
-                self.logger.info(f"Synced filled order: {order.id}")
-                
-            elif order_detail['status'] in ['CANCELED', 'EXPIRED']:
-                # 订单已取消或过期
-                await self.db.update_order_status(order.id, OrderStatus.CANCELED)
-                self.logger.info(f"Synced canceled order: {order.id}")
-                
         except Exception as e:
-            self.logger.error(f"Failed to handle missing order {order.id}: {e}")
+            self.logger.error(f"Failed to fetch order history for {symbol}: {e}")
+            return {}
+        
+        return {str(detail['orderId']): detail for detail in history}
+    
+    async def _handle_missing_order(self, order: OrderInfo, order_detail: Optional[dict] = None,
+                                    now: Optional[datetime] = None):
+        """处理缺失订单（可能已成交）; 批量历史中没有该订单时单独查询"""
+        if now is None:
+            now = datetime.now()
+        async with self._request_sem:
+            try:
+                # 查询订单详细信息
+                if order_detail is None:
+                    order_detail = await self.binance.futures_get_order(
+                        symbol=order.symbol,
+                        orderId=order.exchange_order_id
+                    )
+                
+                if order_detail['status'] == 'FILLED':
+                    # 订单已成交，更新本地状态
+                    filled_quantity = Decimal(order_detail['executedQty'])
+                    avg_price = Decimal(order_detail['avgPrice'])
+                    
+                    await asyncio.to_thread(
+                        self.db.update_order_status,
+                        order.id, OrderStatus.FILLED,
+                        filled_at=now
+                    )
+                    
+                    # 创建交易记录
+                    trade_id = f"sync_trade_{order.id}_{time.time_ns()}_{next(self._trade_seq)}"
+                    await self._create_trade_record(trade_id, order, filled_quantity, avg_price)
+                    
+                    self.logger.info(f"Synced filled order: {order.id}")
+                    
+                elif order_detail['status'] in _EXCHANGE_CLOSED_STATUSES:
+                    # 订单已取消或过期
+                    await asyncio.to_thread(self.db.update_order_status, order.id, OrderStatus.CANCELED)
+                    self.logger.info(f"Synced canceled order: {order.id}")
+                    
+            except Exception as e:
+                self.logger.error(f"Failed to handle missing order {order.id}: {e}")
     
-    async def _handle_extra_order(self, order_id: str):
-        """处理交易所额外订单（可能是手动下单）"""
+    async def _handle_extra_order(self, order_id: str, order_detail: dict):
+        """处理交易所额外订单（可能是手动下单）; order_detail 取自开放订单快照"""
         try:
-            order_detail = await self.binance.futures_get_order(orderId=order_id)
-            
             # 记录发现的额外订单
-            await self.db.log_event("WARNING", "SyncMonitor", 
-                                   f"Found untracked order on exchange: {order_id}",
-                                   {"order_detail": order_detail})
+            self._queue_event("WARNING", f"Found untracked order on exchange: {order_id}",
+                             {"order_detail": order_detail})
             
             # 可选：自动导入到系统中
             # await self._import_external_order(order_detail)
@@ -176,37 +419,36 @@ class OrderSyncMonitor:
         except Exception as e:
             self.logger.error(f"Failed to handle extra order {order_id}: {e}")
     
-    async def _handle_timeout_order(self, order: OrderInfo):
-        """处理超时订单"""
-        try:
-            # 检查订单是否仍然有效
-            if order.exchange_order_id:
-                try:
-                    order_detail = await self.binance.futures_get_order(
-                        symbol=order.symbol,
-                        orderId=order.exchange_order_id
-                    )
-                    
-                    if order_detail['status'] == 'NEW':
-                        # 订单仍然有效但超时，可能需要重新评估
-                        await self.db.log_event("WARNING", "SyncMonitor",
-                                               f"Order timeout but still active: {order.id}")
-                    
-                except:
-                    # 订单查询失败，标记为失败
-                    await self.db.update_order_status(order.id, OrderStatus.FAILED)
-            
-        except Exception as e:
-            self.logger.error(f"Failed to handle timeout order {order.id}: {e}")
+    async def _handle_timeout_order(self, order: OrderInfo, order_detail: Optional[dict] = None):
+        """处理超时订单; 订单仍在开放订单快照中时直接使用快照"""
+        async with self._request_sem:
+            try:
+                # 检查订单是否仍然有效
+                if order.exchange_order_id:
+                    try:
+                        if order_detail is None:
+                            order_detail = await self.binance.futures_get_order(
+                                symbol=order.symbol,
+                                orderId=order.exchange_order_id
+                            )
+                        
+                        if order_detail['status'] == 'NEW':
+                            # 订单仍然有效但超时，可能需要重新评估
+                            self._queue_event("WARNING", f"Order timeout but still active: {order.id}")
+                        
+                    except:
+                        # 订单查询失败，标记为失败
+                        await asyncio.to_thread(self.db.update_order_status, order.id, OrderStatus.FAILED)
+                
+            except Exception as e:
+                self.logger.error(f"Failed to handle timeout order {order.id}: {e}")
     
     async def _create_trade_record(self, trade_id: str, order: OrderInfo, 
                                  quantity: Decimal, price: Decimal):
         """创建交易记录"""
         try:
-            from data_models import TradeRecord
-            
             # 计算手续费和利润
-            commission = quantity * price * Decimal("0.001")  # 0.1% 手续费
+            commission = quantity * price * _FEE_RATE
             profit = self._calculate_trade_profit(order, price)
             
             trade = TradeRecord(
@@ -221,7 +463,7 @@ class OrderSyncMonitor:
                 grid_level=order.grid_level
             )
             
-            await self.db.save_trade(trade)
+            await asyncio.to_thread(self.db.save_trade, trade)
             
         except Exception as e:
             self.logger.error(f"Failed to create trade record: {e}")
@@ -229,30 +471,29 @@ class OrderSyncMonitor:
     def _calculate_trade_profit(self, order: OrderInfo, filled_price: Decimal) -> Decimal:
         """计算交易利润"""
         # 简化的利润计算
-        if order.side == OrderSide.BUY:
+        if order.side is OrderSide.BUY:
             # 买单成交，期望价格上涨
-            expected_sell_price = filled_price * Decimal("1.005")  # 0.5% 利润预期
+            expected_sell_price = filled_price * _PROFIT_MULT
             return (expected_sell_price - filled_price) * order.quantity
         else:
             # 卖单成交，已实现部分利润
-            return filled_price * order.quantity * Decimal("0.005")  # 0.5% 利润
+            return filled_price * order.quantity * _SELL_MARGIN
     
-    async def _detect_anomalies(self):
+    async def _detect_anomalies(self, active_orders: Optional[List[OrderInfo]] = None,
+                                now: Optional[datetime] = None):
         """检测交易异常"""
-        try:
-            # 检测价格异常
-            await self._detect_price_anomalies()
-            
-            # 检测订单执行异常
-            await self._detect_execution_anomalies()
-            
-            # 检测资金异常
-            await self._detect_balance_anomalies()
-            
-        except Exception as e:
-            self.logger.error(f"Anomaly detection failed: {e}")
+        # 价格、订单执行、资金三项检测互相独立，并发执行
+        results = await asyncio.gather(
+            self._detect_price_anomalies(active_orders),
+            self._detect_execution_anomalies(now),
+            self._detect_balance_anomalies(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error(f"Anomaly detection failed: {result}")
     
-    async def _detect_price_anomalies(self):
+    async def _detect_price_anomalies(self, active_orders: Optional[List[OrderInfo]] = None):
         """检测价格异常"""
         try:
             # 获取当前价格
@@ -260,46 +501,44 @@ class OrderSyncMonitor:
             current_price = Decimal(ticker['price'])
             
             # 获取本地活跃订单
-            active_orders = await self._get_local_active_orders()
+            if active_orders is None:
+                active_orders = await self._get_local_active_orders()
             
-            for order in active_orders:
-                price_diff_percent = abs(order.price - current_price) / current_price
-                
-                if price_diff_percent > self.price_deviation_percent:
-                    await self.db.log_event("WARNING", "SyncMonitor",
-                                           f"Large price deviation detected for order {order.id}",
-                                           {
-                                               "order_price": float(order.price),
-                                               "current_price": float(current_price),
-                                               "deviation_percent": float(price_diff_percent * 100)
-                                           })
+            if not active_orders:
+                return
+            
+            # 偏差判断容许 float 精度，一次向量运算后只遍历超限订单
+            current = float(current_price)
+            prices = self._order_columns(active_orders)['price']
+            deviation = np.abs(prices - current) / current
+            flagged = np.flatnonzero(deviation > float(self.price_deviation_percent))
+            
+            for i in flagged:
+                order = active_orders[i]
+                self._queue_event("WARNING", f"Large price deviation detected for order {order.id}",
+                                 {
+                                     "order_price": prices[i].item(),
+                                     "current_price": current,
+                                     "deviation_percent": deviation[i].item() * 100
+                                 })
             
         except Exception as e:
             self.logger.error(f"Price anomaly detection failed: {e}")
     
-    async def _detect_execution_anomalies(self):
+    async def _detect_execution_anomalies(self, now: Optional[datetime] = None):
         """检测执行异常"""
         try:
             # 检查最近1小时内的订单执行情况
-            recent_time = datetime.now() - timedelta(hours=1)
-            
-            # 统计订单成功率
-            total_orders = 0
-            failed_orders = 0
+            recent_time = (now or datetime.now()) - timedelta(hours=1)
             
-            local_orders = await self._get_local_active_orders()
-            for order in local_orders:
-                if order.created_at > recent_time:
-                    total_orders += 1
-                    if order.status == OrderStatus.FAILED:
-                        failed_orders += 1
+            # 统计订单成功率 (计数在 SQL 中完成)
+            total_orders, failed_orders = await asyncio.to_thread(self.db.get_execution_stats, recent_time)
             
             if total_orders > 0:
                 failure_rate = failed_orders / total_orders
                 if failure_rate > 0.1:  # 失败率 > 10%
-                    await self.db.log_event("WARNING", "SyncMonitor",
-                                           f"High order failure rate: {failure_rate:.2%}",
-                                           {"total_orders": total_orders, "failed_orders": failed_orders})
+                    self._queue_event("WARNING", f"High order failure rate: {failure_rate:.2%}",
+                                     {"total_orders": total_orders, "failed_orders": failed_orders})
             
         except Exception as e:
             self.logger.error(f"Execution anomaly detection failed: {e}")
@@ -313,10 +552,9 @@ class OrderSyncMonitor:
             
             # 简单的资金变化检测
             # 这里可以扩展为更复杂的资金流分析
-            if current_balance <= Decimal("0"):
-                await self.db.log_event("CRITICAL", "SyncMonitor",
-                                       "Account balance is zero or negative",
-                                       {"balance": float(current_balance)})
+            if current_balance <= _ZERO:
+                self._queue_event("CRITICAL", "Account balance is zero or negative",
+                                 {"balance": float(current_balance)})
             
         except Exception as e:
             self.logger.error(f"Balance anomaly detection failed: {e}")
@@ -327,5 +565,6 @@ class OrderSyncMonitor:
             "last_sync_time": self.last_sync_time.isoformat(),
             "sync_interval": self.sync_interval,
             "inconsistency_count": self.inconsistency_count,
+            "user_stream_connected": self._stream_connected,
             "status": "healthy" if self.inconsistency_count < self.max_inconsistency else "warning"
         }
\ No newline at end of file
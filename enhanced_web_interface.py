@@ -1,233 +1,73 @@
 # enhanced_web_interface.py - 增强版Web监控界面
 import asyncio
-import json
+import gzip
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from flask import Flask, render_template_string, jsonify, request, websocket
+from datetime import datetime
+from pathlib import Path
+from quart import Quart, Response, request, websocket
 from threading import Thread
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import time
+import numpy as np
+import orjson
+from data_models import GridLevel, dumps_json
 
-class EnhancedWebInterface:
-    """增强版Web监控界面"""
-    
-    def __init__(self, port: int, trading_bot):
-        self.port = port
-        self.bot = trading_bot
-        self.app = Flask(__name__)
-        self.logger = logging.getLogger(__name__)
-        self.server_thread = None
-        self.running = False
-        
-        # WebSocket连接管理
-        self.websocket_clients = set()
-        
-        # 实时数据缓存
-        self.real_time_data = {
-            'price_history': [],
-            'pnl_history': [],
-            'order_flow': [],
-            'risk_metrics': {},
-            'system_metrics': {}
-        }
-        
-        # 设置路由
-        self._setup_routes()
-        self._setup_websocket()
-    
-    def _setup_routes(self):
-        """设置HTTP路由"""
-        
-        @self.app.route('/')
-        def dashboard():
-            return render_template_string(self._get_enhanced_dashboard_template())
-        
-        @self.app.route('/api/status')
-        def api_status():
-            """系统状态API"""
-            return jsonify(self.bot.get_status())
-        
-        @self.app.route('/api/multi_symbol_status')
-        def api_multi_symbol_status():
-            """多币种状态API"""
-            if hasattr(self.bot, 'multi_symbol_manager'):
-                return jsonify(self.bot.multi_symbol_manager.get_multi_symbol_status())
-            return jsonify({})
-        
-        @self.app.route('/api/trades')
-        def api_trades():
-            """交易记录API"""
-            days = request.args.get('days', 7, type=int)
-            symbol = request.args.get('symbol', '')
-            return jsonify(self._get_filtered_trades(days, symbol))
-        
-        @self.app.route('/api/orders')
-        def api_orders():
-            """订单信息API"""
-            symbol = request.args.get('symbol', '')
-            grid_level = request.args.get('grid_level', '')
-            return jsonify(self._get_filtered_orders(symbol, grid_level))
-        
-        @self.app.route('/api/performance')
-        def api_performance():
-            """性能指标API"""
-            symbol = request.args.get('symbol', '')
-            return jsonify(self._get_performance_data(symbol))
-        
-        @self.app.route('/api/risk_analysis')
-        def api_risk_analysis():
-            """风险分析API"""
-            return jsonify(self._get_risk_analysis())
-        
-        @self.app.route('/api/market_analysis')
-        def api_market_analysis():
-            """市场分析API"""
-            symbol = request.args.get('symbol', self.bot.config.symbol)
-            return jsonify(self._get_market_analysis(symbol))
-        
-        @self.app.route('/api/optimization_status')
-        def api_optimization_status():
-            """优化状态API"""
-            if hasattr(self.bot, 'intelligent_optimizer'):
-                return jsonify(self.bot.intelligent_optimizer.get_optimization_status())
-            return jsonify({})
-        
-        @self.app.route('/api/capital_status')
-        def api_capital_status():
-            """资金状态API"""
-            if hasattr(self.bot, 'capital_manager'):
-                return jsonify(self.bot.capital_manager.get_capital_status())
-            return jsonify({})
-        
-        @self.app.route('/api/sync_status')
-        def api_sync_status():
-            """同步状态API"""
-            if hasattr(self.bot, 'sync_monitor'):
-                return jsonify(self.bot.sync_monitor.get_sync_status())
-            return jsonify({})
-        
-        @self.app.route('/api/chart_data')
-        def api_chart_data():
-            """图表数据API"""
-            chart_type = request.args.get('type', 'pnl')
-            period = request.args.get('period', '24h')
-            symbol = request.args.get('symbol', '')
-            return jsonify(self._get_chart_data(chart_type, period, symbol))
-        
-        @self.app.route('/api/system_metrics')
-        def api_system_metrics():
-            """系统性能指标API"""
-            return jsonify(self._get_system_metrics())
-        
-        @self.app.route('/api/alerts')
-        def api_alerts():
-            """告警信息API"""
-            return jsonify(self._get_recent_alerts())
-        
-        # 控制接口
-        @self.app.route('/api/control/pause_symbol', methods=['POST'])
-        def api_pause_symbol():
-            """暂停币种交易"""
-            data = request.json
-            symbol = data.get('symbol')
-            return jsonify(self._pause_symbol_trading(symbol))
-        
-        @self.app.route('/api/control/resume_symbol', methods=['POST'])
-        def api_resume_symbol():
-            """恢复币种交易"""
-            data = request.json
-            symbol = data.get('symbol')
-            return jsonify(self._resume_symbol_trading(symbol))
-        
-        @self.app.route('/api/control/emergency_stop', methods=['POST'])
-        def api_emergency_stop():
-            """紧急停止"""
-            return jsonify(self._emergency_stop())
-    
-    def _setup_websocket(self):
-        """设置WebSocket"""
-        
-        @self.app.websocket('/ws')
-        def handle_websocket():
-            """WebSocket处理"""
-            try:
-                self.websocket_clients.add(websocket)
-                self.logger.info("WebSocket client connected")
-                
-                while True:
-                    # 保持连接
-                    message = websocket.receive()
-                    if message:
-                        # 处理客户端消息
-                        self._handle_websocket_message(websocket, message)
-                    
-            except Exception as e:
-                self.logger.error(f"WebSocket error: {e}")
-            finally:
-                self.websocket_clients.discard(websocket)
-                self.logger.info("WebSocket client disconnected")
-    
-    def _handle_websocket_message(self, ws, message: str):
-        """处理WebSocket消息"""
-        try:
-            data = json.loads(message)
-            msg_type = data.get('type')
-            
-            if msg_type == 'subscribe':
-                # 订阅实时数据
-                channels = data.get('channels', [])
-                # 发送初始数据
-                for channel in channels:
-                    initial_data = self._get_channel_data(channel)
-                    ws.send(json.dumps({
-                        'type': 'data',
-                        'channel': channel,
-                        'data': initial_data
-                    }))
-            
-            elif msg_type == 'ping':
-                # 心跳响应
-                ws.send(json.dumps({'type': 'pong', 'timestamp': time.time()}))
-                
-        except Exception as e:
-            self.logger.error(f"Error handling WebSocket message: {e}")
-    
-    def _get_channel_data(self, channel: str) -> dict:
-        """获取频道数据"""
-        if channel == 'price':
-            return {'current_price': float(self.bot.trading_engine.current_price) if self.bot.trading_engine else 0}
-        elif channel == 'orders':
-            return {'active_orders': len(self.bot.get_orders())}
-        elif channel == 'performance':
-            return self._get_performance_data('')
-        else:
-            return {}
-    
-    def broadcast_update(self, channel: str, data: dict):
-        """广播更新到所有WebSocket客户端"""
-        if not self.websocket_clients:
-            return
-        
-        message = json.dumps({
-            'type': 'update',
-            'channel': channel,
-            'data': data,
-            'timestamp': time.time()
-        })
-        
-        disconnected_clients = set()
-        for client in self.websocket_clients:
-            try:
-                client.send(message)
-            except:
-                disconnected_clients.add(client)
-        
-        # 清理断开的连接
-        self.websocket_clients -= disconnected_clients
-    
-    def _get_enhanced_dashboard_template(self) -> str:
-        """获取增强版仪表板HTML模板"""
-        return """
+try:
+    import redis
+except ImportError:  # 未安装 redis 时预计算结果只保存在进程内
+    redis = None
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时所有频道只发送 JSON 文本帧
+    msgpack = None
+
+# 预计算 API 响应: 每秒刷新一次，Redis 中的键在两个刷新周期后过期
+_CACHE_REFRESH_INTERVAL = 1.0
+_CACHE_TTL = 2
+
+# 刷新后内容有变化即推送到 WebSocket 的缓存键 -> 频道
+_PUSH_CHANNELS = {
+    'api:status': 'status',
+    'api:multi_symbol_status': 'multi_symbol_status',
+    'api:performance:': 'performance',
+}
+
+# 判断内容是否变化时忽略的字段: 时间戳与运行时长每次刷新都会变，价格由 price 频道单独推送
+_PUSH_IGNORED_FIELDS = frozenset({'uptime_seconds', 'last_update', 'updated_at', 'current_price'})
+
+def _without_ignored_fields(data):
+    """递归去掉 _PUSH_IGNORED_FIELDS 中的字段，用于推送前的变化比较"""
+    if isinstance(data, dict):
+        return {k: _without_ignored_fields(v) for k, v in data.items() if k not in _PUSH_IGNORED_FIELDS}
+    if isinstance(data, list):
+        return [_without_ignored_fields(v) for v in data]
+    return data
+
+# 仪表板页面不带版本号，升级后须立即生效: 浏览器每次按 ETag 校验，未变化时返回 304
+_DASHBOARD_CACHE_CONTROL = 'no-cache'
+
+# 实时数据每5秒采样一次，历史缓冲保留最近24小时
+_BROADCAST_INTERVAL = 5
+_HISTORY_CAPACITY = 24 * 3600 // _BROADCAST_INTERVAL
+
+# 单个客户端发送超时 (秒)，超时视为断开，避免慢客户端拖住整轮广播
+_WS_SEND_TIMEOUT = 1.0
+
+# 心跳快速路径: 按前缀识别 ping，直接套用 pong 模板，不做 JSON 解析
+_PING_PREFIXES = ('{"type":"ping"', b'{"type":"ping"')
+_PONG_TEMPLATE = '{"type":"pong","timestamp":%.3f}'
+
+# 订阅时声明 encoding=msgpack 的客户端在这些频道上收到 msgpack 二进制帧
+_MSGPACK_CHANNELS = frozenset({'price'})
+
+# 图表类型 -> real_time_data 中的序列；周期 -> 秒
+_CHART_SERIES = {'price': 'price_history', 'pnl': 'pnl_history', 'orders': 'order_flow'}
+_CHART_PERIODS = {'1h': 3600, '6h': 6 * 3600, '24h': 24 * 3600}
+
+# 增强版仪表板页面 (静态 HTML，无模板变量)；导入时编码并预压缩一次，请求直接返回字节
+_DASHBOARD_HTML = """
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -236,6 +76,7 @@ class EnhancedWebInterface:
     <title>天地双网格交易系统 - 增强版监控面板</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script src="https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns"></script>
+    <script src="https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2/dist.es5+umd/msgpack.min.js"></script>
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
     <style>
@@ -680,9 +521,6 @@ class EnhancedWebInterface:
             initializeInterface();
             initializeWebSocket();
             loadInitialData();
-            
-            // 设置定期更新
-            updateInterval = setInterval(updateDashboard, 5000);
         });
         
         function initializeInterface() {
@@ -741,20 +579,31 @@ class EnhancedWebInterface:
             try {
                 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
                 websocket = new WebSocket(`${protocol}//${window.location.host}/ws`);
+                websocket.binaryType = 'arraybuffer';
                 
                 websocket.onopen = function() {
                     console.log('WebSocket connected');
                     updateConnectionStatus(true);
                     
+                    // 已连接时由服务端推送，停止轮询
+                    if (updateInterval) {
+                        clearInterval(updateInterval);
+                        updateInterval = null;
+                    }
+                    
                     // 订阅实时数据
                     websocket.send(JSON.stringify({
                         type: 'subscribe',
-                        channels: ['price', 'orders', 'performance', 'alerts']
+                        channels: ['price', 'orders', 'performance', 'alerts', 'status', 'multi_symbol_status'],
+                        // msgpack 库加载成功时价格频道改用二进制帧
+                        encoding: window.MessagePack ? 'msgpack' : 'json'
                     }));
                 };
                 
                 websocket.onmessage = function(event) {
-                    const data = JSON.parse(event.data);
+                    const data = event.data instanceof ArrayBuffer
+                        ? MessagePack.decode(event.data)
+                        : JSON.parse(event.data);
                     handleWebSocketMessage(data);
                 };
                 
@@ -762,6 +611,11 @@ class EnhancedWebInterface:
                     console.log('WebSocket disconnected');
                     updateConnectionStatus(false);
                     
+                    // 断开期间回退为定期轮询
+                    if (!updateInterval) {
+                        updateInterval = setInterval(updateDashboard, 5000);
+                    }
+                    
                     // 尝试重连
                     setTimeout(initializeWebSocket, 5000);
                 };
@@ -778,7 +632,8 @@ class EnhancedWebInterface:
         }
         
         function handleWebSocketMessage(data) {
-            if (data.type === 'update') {
+            // data: 订阅时的初始数据；update: 服务端推送的更新
+            if (data.type === 'update' || data.type === 'data') {
                 switch (data.channel) {
                     case 'price':
                         updatePriceDisplay(data.data);
@@ -792,10 +647,56 @@ class EnhancedWebInterface:
                     case 'alerts':
                         updateAlertsDisplay(data.data);
                         break;
+                    case 'status':
+                        updateSystemStatus(data.data);
+                        updateLastUpdate();
+                        break;
+                    case 'multi_symbol_status':
+                        applyMultiSymbolStatus(data.data);
+                        break;
                 }
             }
         }
         
+        function updatePriceDisplay(data) {
+            document.getElementById('current-price').textContent = 
+                `$${parseFloat(data.current_price || 0).toFixed(2)}`;
+        }
+        
+        function updateOrdersDisplay(data) {
+            document.getElementById('active-orders').textContent = data.active_orders || 0;
+        }
+        
+        function updatePerformanceDisplay(data) {
+            document.getElementById('total-pnl').textContent = 
+                `$${parseFloat(data.total_pnl || 0).toFixed(2)}`;
+        }
+        
+        function updateAlertsDisplay(data) {
+            const container = document.getElementById('alerts-container');
+            const alerts = data.alerts || [];
+            
+            if (alerts.length === 0) {
+                container.innerHTML = '<div class="text-white text-center py-4 opacity-80">暂无告警</div>';
+                return;
+            }
+            
+            container.innerHTML = alerts.map(alert => `
+                <div class="text-white text-sm py-2 border-b border-white border-opacity-10">
+                    <span class="px-2 py-1 rounded text-xs mr-2 ${alert.level === 'info' ? 'bg-blue-500' : 'bg-red-500'}">
+                        ${alert.level}
+                    </span>
+                    ${alert.message}
+                    <span class="text-xs opacity-60 ml-2">${new Date(alert.timestamp).toLocaleTimeString()}</span>
+                </div>
+            `).join('');
+        }
+        
+        function updateLastUpdate() {
+            document.getElementById('last-update').textContent = 
+                `最后更新: ${new Date().toLocaleTimeString()}`;
+        }
+        
         function updateConnectionStatus(connected) {
             const indicator = document.getElementById('connection-status');
             if (connected) {
@@ -833,9 +734,7 @@ class EnhancedWebInterface:
                 const response = await fetch('/api/status');
                 const data = await response.json();
                 updateSystemStatus(data);
-                
-                document.getElementById('last-update').textContent = 
-                    `最后更新: ${new Date().toLocaleTimeString()}`;
+                updateLastUpdate();
                 
             } catch (error) {
                 console.error('Dashboard update failed:', error);
@@ -929,17 +828,19 @@ class EnhancedWebInterface:
         async function loadMultiSymbolStatus() {
             try {
                 const response = await fetch('/api/multi_symbol_status');
-                const data = await response.json();
-                
-                if (data.total_symbols > 1) {
-                    document.getElementById('multi-symbol-section').style.display = 'block';
-                    renderMultiSymbolStatus(data);
-                }
+                applyMultiSymbolStatus(await response.json());
             } catch (error) {
                 console.error('Failed to load multi-symbol status:', error);
             }
         }
         
+        function applyMultiSymbolStatus(data) {
+            if (data.total_symbols > 1) {
+                document.getElementById('multi-symbol-section').style.display = 'block';
+                renderMultiSymbolStatus(data);
+            }
+        }
+        
         function renderMultiSymbolStatus(data) {
             const container = document.getElementById('symbol-status-grid');
             container.innerHTML = '';
@@ -1051,37 +952,520 @@ class EnhancedWebInterface:
     </script>
 </body>
 </html>
-        """
+"""
+_DASHBOARD_HTML_BYTES = _DASHBOARD_HTML.encode('utf-8')
+_DASHBOARD_GZIP = gzip.compress(_DASHBOARD_HTML_BYTES, compresslevel=9)
+_DASHBOARD_ETAG = hashlib.sha1(_DASHBOARD_HTML_BYTES).hexdigest()[:16]
+
+class _RingSeries:
+    """定长时间序列环形缓冲 (SoA: 时间戳 / 数值两列 float64)，写满后覆盖最旧的点"""
+    __slots__ = ('timestamps', 'values', 'head')
     
-    def _get_filtered_trades(self, days: int, symbol: str) -> List[dict]:
-        """获取过滤后的交易记录"""
+    def __init__(self, capacity: int = _HISTORY_CAPACITY):
+        self.timestamps = np.empty(capacity)
+        self.values = np.empty(capacity)
+        self.head = 0  # 累计写入点数
+    
+    def push(self, timestamp: float, value: float):
+        i = self.head % self.timestamps.shape[0]
+        self.timestamps[i] = timestamp
+        self.values[i] = value
+        self.head += 1
+    
+    def window(self, since: float) -> Tuple[np.ndarray, np.ndarray]:
+        """按时间顺序返回 since 之后的点"""
+        capacity = self.timestamps.shape[0]
+        head = self.head
+        order = np.arange(head - min(head, capacity), head) % capacity
+        timestamps = self.timestamps[order]
+        start = np.searchsorted(timestamps, since, side='right')
+        return timestamps[start:], self.values[order[start:]]
+
+class EnhancedWebInterface:
+    """增强版Web监控界面"""
+    
+    def __init__(self, port: int, trading_bot, redis_url: Optional[str] = None,
+                 static_dir: Optional[str] = None):
+        self.port = port
+        self.bot = trading_bot
+        # ASGI 应用 (Quart，接口与 Flask 一致)，与交易系统运行在同一事件循环中
+        self.app = Quart(__name__)
+        self.logger = logging.getLogger(__name__)
+        self.server: Optional[Any] = None  # uvicorn.Server (启动时才导入 uvicorn)
+        self.running = False
+        
+        # API 响应缓存 (已序列化的 JSON 字节)，由后台线程统一刷新，请求只读取
+        # 配置 redis_url 时存入 Redis，多个 Web 进程共享同一份结果
+        self.redis = redis.Redis.from_url(redis_url) if redis_url and redis else None
+        self._api_cache: Dict[str, bytes] = {}
+        self._cache_thread: Optional[Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pushed: Dict[str, bytes] = {}  # 各推送频道最近一次推送内容 (去掉易变字段后序列化)
+        
+        # 活跃订单数按订单版本号缓存，版本不变时不再查询订单
+        self._cached_orders_version: Optional[int] = -1
+        self._cached_orders_len = 0
+        
+        # 可选组件的状态接口在初始化时解析一次 (机器人未启用该组件时为 None)
+        self._status_providers: Dict[str, Optional[Callable[[], dict]]] = {
+            'multi_symbol': self._resolve_provider('multi_symbol_manager', 'get_multi_symbol_status'),
+            'optimization': self._resolve_provider('intelligent_optimizer', 'get_optimization_status'),
+            'capital': self._resolve_provider('capital_manager', 'get_capital_status'),
+            'sync': self._resolve_provider('sync_monitor', 'get_sync_status'),
+        }
+        
+        # 配置 static_dir 时同时写出静态文件，由 nginx 直接托管页面 (本进程只需承载 /api 与 /ws)
+        if static_dir:
+            self._export_dashboard(static_dir)
+        
+        # WebSocket连接管理: 只追加的列表 + 墓碑标记，广播时顺序遍历
+        # 断开的连接只做标记，墓碑过半时压缩；压缩会改变下标，故递增代数
+        self.websocket_clients: list = []
+        self._ws_dead: List[bool] = []
+        self._ws_dead_count = 0
+        self._ws_generation = 0
+        self._msgpack_clients: set = set()  # 协商使用 msgpack 二进制帧的连接
+        
+        # 实时数据缓存
+        self.real_time_data: Dict[str, Any] = {
+            'price_history': _RingSeries(),
+            'pnl_history': _RingSeries(),
+            'order_flow': _RingSeries(),
+            'risk_metrics': {},
+            'system_metrics': {}
+        }
+        
+        # 设置路由
+        self._setup_routes()
+        self._setup_websocket()
+    
+    def _export_dashboard(self, directory: str):
+        """写出 index.html 及预压缩的 index.html.gz (供 nginx gzip_static 使用)"""
+        try:
+            path = Path(directory)
+            path.mkdir(parents=True, exist_ok=True)
+            (path / 'index.html').write_bytes(_DASHBOARD_HTML_BYTES)
+            (path / 'index.html.gz').write_bytes(_DASHBOARD_GZIP)
+        except OSError as e:
+            self.logger.error(f"Failed to export dashboard to {directory}: {e}")
+    
+    def _setup_routes(self):
+        """设置HTTP路由"""
+        
+        @self.app.route('/')
+        async def dashboard():
+            # 两种编码是不同的表示，各用一个 ETag
+            use_gzip = request.accept_encodings['gzip'] > 0
+            etag = _DASHBOARD_ETAG + '-gz' if use_gzip else _DASHBOARD_ETAG
+            if etag in request.if_none_match:
+                response = Response(b'', status=304)
+            elif use_gzip:
+                response = Response(_DASHBOARD_GZIP, mimetype='text/html')
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = Response(_DASHBOARD_HTML_BYTES, mimetype='text/html')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = _DASHBOARD_CACHE_CONTROL
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+        
+        @self.app.route('/api/status')
+        def api_status():
+            """系统状态API"""
+            return self._cached_response('api:status', self.bot.get_status)
+        
+        @self.app.route('/api/multi_symbol_status')
+        def api_multi_symbol_status():
+            """多币种状态API"""
+            return self._cached_response('api:multi_symbol_status', self._get_multi_symbol_status)
+        
+        @self.app.route('/api/trades')
+        def api_trades():
+            """交易记录API"""
+            days = request.args.get('days', 7, type=int)
+            symbol = request.args.get('symbol', '')
+            return self._json_response(dumps_json(self._get_filtered_trades(days, symbol)))
+        
+        @self.app.route('/api/orders')
+        def api_orders():
+            """订单信息API"""
+            symbol = request.args.get('symbol', '')
+            grid_level = request.args.get('grid_level', '')
+            return self._json_response(dumps_json(self._get_filtered_orders(symbol, grid_level)))
+        
+        @self.app.route('/api/performance')
+        def api_performance():
+            """性能指标API"""
+            symbol = request.args.get('symbol', '')
+            return self._cached_response(f'api:performance:{symbol}',
+                                         lambda: self._get_performance_data(symbol))
+        
+        @self.app.route('/api/risk_analysis')
+        def api_risk_analysis():
+            """风险分析API"""
+            return self._cached_response('api:risk_analysis', self._get_risk_analysis)
+        
+        @self.app.route('/api/market_analysis')
+        def api_market_analysis():
+            """市场分析API"""
+            symbol = request.args.get('symbol', self.bot.config.symbol)
+            return self._cached_response(f'api:market_analysis:{symbol}',
+                                         lambda: self._get_market_analysis(symbol))
+        
+        @self.app.route('/api/optimization_status')
+        def api_optimization_status():
+            """优化状态API"""
+            return self._cached_response('api:optimization_status', self._get_optimization_status)
+        
+        @self.app.route('/api/capital_status')
+        def api_capital_status():
+            """资金状态API"""
+            return self._cached_response('api:capital_status', self._get_capital_status)
+        
+        @self.app.route('/api/sync_status')
+        def api_sync_status():
+            """同步状态API"""
+            return self._cached_response('api:sync_status', self._get_sync_status)
+        
+        @self.app.route('/api/chart_data')
+        def api_chart_data():
+            """图表数据API"""
+            chart_type = request.args.get('type', 'pnl')
+            period = request.args.get('period', '24h')
+            symbol = request.args.get('symbol', '')
+            return self._cached_response(f'api:chart_data:{chart_type}:{period}:{symbol}',
+                                         lambda: self._get_chart_data(chart_type, period, symbol))
+        
+        @self.app.route('/api/system_metrics')
+        def api_system_metrics():
+            """系统性能指标API"""
+            return self._cached_response('api:system_metrics', self._get_system_metrics)
+        
+        @self.app.route('/api/alerts')
+        def api_alerts():
+            """告警信息API"""
+            return self._json_response(dumps_json(self._get_recent_alerts()))
+        
+        # 控制接口
+        @self.app.route('/api/control/pause_symbol', methods=['POST'])
+        async def api_pause_symbol():
+            """暂停币种交易"""
+            data = await request.get_json()
+            symbol = data.get('symbol')
+            return self._json_response(dumps_json(self._pause_symbol_trading(symbol)))
+        
+        @self.app.route('/api/control/resume_symbol', methods=['POST'])
+        async def api_resume_symbol():
+            """恢复币种交易"""
+            data = await request.get_json()
+            symbol = data.get('symbol')
+            return self._json_response(dumps_json(self._resume_symbol_trading(symbol)))
+        
+        @self.app.route('/api/control/emergency_stop', methods=['POST'])
+        def api_emergency_stop():
+            """紧急停止"""
+            return self._json_response(dumps_json(self._emergency_stop()))
+    
+    def _cached_response(self, key: str, compute: Callable[[], object]) -> Response:
+        """返回后台线程预计算的响应；缓存中没有 (如非默认参数) 或 Redis 不可用时当场计算"""
+        if self.redis:
+            try:
+                payload = self.redis.get(key)
+            except redis.RedisError as e:
+                self.logger.warning(f"Redis cache read failed for {key}: {e}")
+                payload = None
+        else:
+            payload = self._api_cache.get(key)
+        if payload is None:
+            payload = dumps_json(compute())
+        return self._json_response(payload)
+    
+    @staticmethod
+    def _json_response(payload: bytes) -> Response:
+        """已序列化的 JSON 字节直接作为响应体"""
+        return Response(payload, mimetype='application/json')
+    
+    def _cache_sources(self) -> Dict[str, Callable[[], object]]:
+        """需要预计算的缓存键及其数据来源；按币种区分的接口为每个已知币种各建一个键"""
+        # 绩效指标目前取自全局汇总，不区分币种，所有币种的键共用一个来源
+        performance = lambda: self._get_performance_data('')
+        sources = {
+            'api:status': self.bot.get_status,
+            'api:multi_symbol_status': self._get_multi_symbol_status,
+            'api:performance:': performance,
+            'api:risk_analysis': self._get_risk_analysis,
+            'api:optimization_status': self._get_optimization_status,
+            'api:capital_status': self._get_capital_status,
+            'api:sync_status': self._get_sync_status,
+            'api:chart_data:pnl:24h:': lambda: self._get_chart_data('pnl', '24h', ''),
+            'api:system_metrics': self._get_system_metrics,
+        }
+        for symbol in self._known_symbols():
+            sources[f'api:performance:{symbol}'] = performance
+            sources[f'api:market_analysis:{symbol}'] = lambda s=symbol: self._get_market_analysis(s)
+        return sources
+    
+    def _known_symbols(self) -> List[str]:
+        """主交易对及多币种管理器中配置的币种"""
+        symbols = [self.bot.config.symbol]
+        manager = getattr(self.bot, 'multi_symbol_manager', None)
+        if manager:
+            symbols.extend(symbol for symbol in manager.symbol_configs if symbol not in symbols)
+        return symbols
+    
+    def _refresh_api_cache(self):
+        """计算并序列化全部缓存键，每项只计算一次供所有客户端共享"""
+        # Redis 写入经非事务 pipeline 合并，每轮刷新只有一次往返
+        pipe = self.redis.pipeline(transaction=False) if self.redis else None
+        computed = {}  # 来源对象 -> (数据, 序列化结果)，多个键共用同一来源时只计算一次
+        for key, compute in self._cache_sources().items():
+            try:
+                if compute not in computed:
+                    data = compute()
+                    computed[compute] = (data, dumps_json(data))
+                data, payload = computed[compute]
+            except Exception as e:
+                self.logger.error(f"Failed to refresh {key}: {e}")
+                # 计算失败时移除旧值，请求回退到当场计算
+                if pipe:
+                    pipe.delete(key)
+                else:
+                    self._api_cache.pop(key, None)
+                continue
+            
+            if pipe:
+                pipe.setex(key, _CACHE_TTL, payload)
+            else:
+                self._api_cache[key] = payload
+            
+            if key in _PUSH_CHANNELS:
+                self._push_if_changed(key, data)
+        
+        if pipe:
+            pipe.execute()
+    
+    def _push_if_changed(self, key: str, data: Any):
+        """内容 (忽略易变字段) 与上次推送不同时，在事件循环中广播给 WebSocket 客户端 (由刷新线程调用)"""
+        fingerprint = dumps_json(_without_ignored_fields(data))
+        if fingerprint == self._pushed.get(key):
+            return
+        self._pushed[key] = fingerprint
+        if self._loop and self.websocket_clients:
+            asyncio.run_coroutine_threadsafe(self.broadcast_update(_PUSH_CHANNELS[key], data), self._loop)
+    
+    def _cache_refresher(self):
+        """后台刷新线程"""
+        while self.running:
+            try:
+                self._refresh_api_cache()
+            except Exception as e:
+                self.logger.error(f"API cache refresh error: {e}")
+            time.sleep(_CACHE_REFRESH_INTERVAL)
+    
+    def _setup_websocket(self):
+        """设置WebSocket"""
+        
+        @self.app.websocket('/ws')
+        async def handle_websocket():
+            """WebSocket处理 (客户端断开时 Quart 取消本协程)"""
+            ws = websocket._get_current_object()  # type: ignore[attr-defined]  # 代理对象 -> 当前连接
+            try:
+                self.websocket_clients.append(ws)
+                self._ws_dead.append(False)
+                self.logger.info("WebSocket client connected")
+                
+                while True:
+                    # 保持连接
+                    message = await ws.receive()
+                    if message:
+                        # 处理客户端消息
+                        await self._handle_websocket_message(ws, message)
+                    
+            except Exception as e:
+                self.logger.error(f"WebSocket error: {e}")
+            finally:
+                self._mark_client_dead(ws)
+                self._msgpack_clients.discard(ws)
+                self.logger.info("WebSocket client disconnected")
+    
+    async def _handle_websocket_message(self, ws, message: str):
+        """处理WebSocket消息"""
         try:
-            trades = self.bot.get_trades(days)
+            if message[:14] in _PING_PREFIXES:
+                # 心跳响应
+                await ws.send(_PONG_TEMPLATE % time.time())
+                return
             
-            if symbol:
-                trades = [trade for trade in trades if trade.get('symbol') == symbol]
+            data = orjson.loads(message)
+            msg_type = data.get('type')
             
-            return trades
+            if msg_type == 'subscribe':
+                # 订阅实时数据
+                channels = data.get('channels', [])
+                if data.get('encoding') == 'msgpack' and msgpack is not None:
+                    self._msgpack_clients.add(ws)
+                # 发送初始数据
+                for channel in channels:
+                    initial_data = await asyncio.to_thread(self._get_channel_data, channel)
+                    payload = {
+                        'type': 'data',
+                        'channel': channel,
+                        'data': initial_data
+                    }
+                    if channel in _MSGPACK_CHANNELS and ws in self._msgpack_clients:
+                        await ws.send(msgpack.packb(payload, use_bin_type=True))
+                    else:
+                        await ws.send(dumps_json(payload).decode())
+            
+            elif msg_type == 'ping':
+                # 带空格等非紧凑格式的心跳
+                await ws.send(_PONG_TEMPLATE % time.time())
+                
+        except Exception as e:
+            self.logger.error(f"Error handling WebSocket message: {e}")
+    
+    def _get_channel_data(self, channel: str) -> dict:
+        """获取频道数据"""
+        if channel == 'price':
+            return {'current_price': float(self.bot.trading_engine.current_price) if self.bot.trading_engine else 0}
+        elif channel == 'orders':
+            return {'active_orders': self._active_order_count()}
+        elif channel == 'performance':
+            return self._get_performance_data('')
+        elif channel == 'status':
+            return self.bot.get_status()
+        elif channel == 'multi_symbol_status':
+            return self._get_multi_symbol_status()
+        elif channel == 'alerts':
+            return {'alerts': self._get_recent_alerts()}
+        else:
+            return {}
+    
+    def _active_order_count(self) -> int:
+        """活跃订单数；机器人未提供版本号时每次查询"""
+        version = getattr(self.bot, 'orders_version', None)
+        if version is None or version != self._cached_orders_version:
+            self._cached_orders_len = len(self.bot.get_orders())
+            self._cached_orders_version = version
+        return self._cached_orders_len
+    
+    def _mark_client_dead(self, ws, index: Optional[int] = None):
+        """给连接打墓碑标记；index 为调用方已知的下标 (无则查找)"""
+        if index is None:
+            try:
+                index = self.websocket_clients.index(ws)
+            except ValueError:
+                return  # 已被压缩移除
+        if not self._ws_dead[index]:
+            self._ws_dead[index] = True
+            self._ws_dead_count += 1
+    
+    def _compact_clients(self):
+        """墓碑过半时移除已断开的连接"""
+        if self._ws_dead_count * 2 <= len(self.websocket_clients):
+            return
+        self.websocket_clients = [c for c, dead in zip(self.websocket_clients, self._ws_dead) if not dead]
+        self._ws_dead = [False] * len(self.websocket_clients)
+        self._ws_dead_count = 0
+        self._ws_generation += 1
+    
+    async def broadcast_update(self, channel: str, data: dict):
+        """广播更新到所有WebSocket客户端 (各客户端并发发送)"""
+        self._compact_clients()
+        if len(self.websocket_clients) == self._ws_dead_count:
+            return
+        
+        # 每种编码只序列化一次，所有客户端共用同一帧 (仪表板按文本 JSON.parse)
+        payload = {
+            'type': 'update',
+            'channel': channel,
+            'data': data,
+            'timestamp': time.time()
+        }
+        message = dumps_json(payload).decode()
+        packed = None
+        if channel in _MSGPACK_CHANNELS and self._msgpack_clients:
+            packed = msgpack.packb(payload, use_bin_type=True)
+        
+        generation = self._ws_generation
+        live = [(i, client) for i, (client, dead) in enumerate(zip(self.websocket_clients, self._ws_dead))
+                if not dead]
+        results = await asyncio.gather(
+            *(asyncio.wait_for(client.send(packed if packed and client in self._msgpack_clients else message),
+                               _WS_SEND_TIMEOUT)
+              for _, client in live),
+            return_exceptions=True
+        )
+        
+        # 标记断开 / 发送超时的连接；发送期间发生过压缩时按对象重新查找下标
+        same_generation = generation == self._ws_generation
+        failed = []
+        for (i, client), result in zip(live, results):
+            if isinstance(result, Exception):
+                self._mark_client_dead(client, i if same_generation else None)
+                failed.append(client)
+        
+        # 主动关闭这些连接: 仅打标记时超时的连接仍保持打开，页面不会重连，也收不到后续广播
+        if failed:
+            await asyncio.gather(*(self._close_client(client) for client in failed))
+    
+    async def _close_client(self, client):
+        """以 1011 关闭连接，触发仪表板重连；连接已断开或关闭超时时忽略"""
+        try:
+            await asyncio.wait_for(client.close(1011), _WS_SEND_TIMEOUT)
+        except Exception as e:
+            self.logger.debug(f"Closing WebSocket client failed: {e!r}")
+    
+    def _get_filtered_trades(self, days: int, symbol: str) -> List[dict]:
+        """获取过滤后的交易记录 (先按币种过滤，只为命中的记录构造 dict)"""
+        try:
+            if not self.bot.db:
+                return []
+            
+            return [trade.to_dict() for trade in self.bot.db.iter_trades(days)
+                    if not symbol or trade.symbol == symbol]
         except Exception as e:
             self.logger.error(f"Failed to get filtered trades: {e}")
             return []
     
     def _get_filtered_orders(self, symbol: str, grid_level: str) -> List[dict]:
-        """获取过滤后的订单"""
+        """获取过滤后的订单 (网格层级在 SQL 中过滤)"""
         try:
-            orders = self.bot.get_orders()
-            
-            if symbol:
-                orders = [order for order in orders if order.get('symbol') == symbol]
-            
-            if grid_level:
-                orders = [order for order in orders if order.get('grid_level') == grid_level]
+            if not self.bot.db:
+                return []
             
-            return orders
+            level = GridLevel(grid_level) if grid_level else None
+            return [order.to_dict() for order in self.bot.db.get_active_orders(level)
+                    if not symbol or order.symbol == symbol]
         except Exception as e:
             self.logger.error(f"Failed to get filtered orders: {e}")
             return []
     
+    def _resolve_provider(self, component: str, method: str) -> Optional[Callable[[], dict]]:
+        """机器人组件的状态方法；组件不存在时返回 None"""
+        obj = getattr(self.bot, component, None)
+        return getattr(obj, method) if obj is not None else None
+    
+    def _get_multi_symbol_status(self) -> dict:
+        """多币种状态"""
+        provider = self._status_providers['multi_symbol']
+        return provider() if provider else {}
+    
+    def _get_optimization_status(self) -> dict:
+        """优化状态"""
+        provider = self._status_providers['optimization']
+        return provider() if provider else {}
+    
+    def _get_capital_status(self) -> dict:
+        """资金状态"""
+        provider = self._status_providers['capital']
+        return provider() if provider else {}
+    
+    def _get_sync_status(self) -> dict:
+        """同步状态"""
+        provider = self._status_providers['sync']
+        return provider() if provider else {}
+    
     def _get_performance_data(self, symbol: str) -> dict:
         """获取性能数据"""
         try:
@@ -1130,25 +1514,16 @@ class EnhancedWebInterface:
     def _get_chart_data(self, chart_type: str, period: str, symbol: str) -> dict:
         """获取图表数据"""
         try:
-            if chart_type == 'pnl':
-                # 生成模拟盈亏数据
-                now = datetime.now()
-                data_points = []
-                
-                for i in range(24):
-                    timestamp = now - timedelta(hours=23-i)
-                    value = i * 0.5 + (i % 3) * 0.2  # 模拟数据
-                    data_points.append({
-                        'timestamp': timestamp.isoformat(),
-                        'value': value
-                    })
-                
-                return {'data': data_points}
+            series = self.real_time_data.get(_CHART_SERIES.get(chart_type, ''))
+            if series is None:
+                return {'timestamps': [], 'values': []}
             
-            return {'data': []}
+            # 列式输出: 两列各一次 tolist，不逐点构造 dict
+            timestamps, values = series.window(time.time() - _CHART_PERIODS.get(period, 24 * 3600))
+            return {'timestamps': timestamps.tolist(), 'values': values.tolist()}
         except Exception as e:
             self.logger.error(f"Failed to get chart data: {e}")
-            return {'data': []}
+            return {'timestamps': [], 'values': []}
     
     def _get_system_metrics(self) -> dict:
         """获取系统性能指标"""
@@ -1217,24 +1592,30 @@ class EnhancedWebInterface:
     async def start(self):
         """启动增强版Web界面"""
         try:
+            import uvicorn
+            
             self.running = True
             
-            def run_server():
-                self.app.run(
-                    host='0.0.0.0',
-                    port=self.port,
-                    debug=False,
-                    use_reloader=False,
-                    threaded=True
-                )
+            # uvicorn 在当前事件循环中运行 (入口安装 uvloop 时即为 uvloop)；httptools 解析 HTTP
+            self.server = uvicorn.Server(uvicorn.Config(
+                self.app,
+                host='0.0.0.0',
+                port=self.port,
+                http='httptools',
+                log_level='warning'
+            ))
+            server_task = asyncio.create_task(self.server.serve())
             
-            self.server_thread = Thread(target=run_server, daemon=True)
-            self.server_thread.start()
+            # 刷新线程通过 run_coroutine_threadsafe 把推送交给当前事件循环
+            self._loop = asyncio.get_running_loop()
+            self._cache_thread = Thread(target=self._cache_refresher, name="web-api-cache", daemon=True)
+            self._cache_thread.start()
             
             self.logger.info(f"Enhanced web interface started on port {self.port}")
             
             # 启动实时数据广播
             await self._start_real_time_broadcast()
+            await server_task
             
         except Exception as e:
             self.logger.error(f"Failed to start enhanced web interface: {e}")
@@ -1243,22 +1624,30 @@ class EnhancedWebInterface:
         """启动实时数据广播"""
         while self.running:
             try:
+                now = time.time()
+                
                 # 广播价格更新
                 if self.bot.trading_engine:
                     price_data = {
                         'current_price': float(self.bot.trading_engine.current_price),
-                        'timestamp': time.time()
+                        'timestamp': now
                     }
-                    self.broadcast_update('price', price_data)
+                    self.real_time_data['price_history'].push(now, price_data['current_price'])
+                    await self.broadcast_update('price', price_data)
                 
-                # 广播订单更新
+                # 广播订单更新 (订单与绩效查询为阻塞调用，放到线程中执行)
                 orders_data = {
-                    'active_orders': len(self.bot.get_orders()),
-                    'timestamp': time.time()
+                    'active_orders': await asyncio.to_thread(self._active_order_count),
+                    'timestamp': now
                 }
-                self.broadcast_update('orders', orders_data)
+                self.real_time_data['order_flow'].push(now, orders_data['active_orders'])
+                await self.broadcast_update('orders', orders_data)
+                
+                performance = await asyncio.to_thread(self._get_performance_data, '')
+                if performance:
+                    self.real_time_data['pnl_history'].push(now, performance['total_pnl'])
                 
-                await asyncio.sleep(5)  # 每5秒广播一次
+                await asyncio.sleep(_BROADCAST_INTERVAL)  # 每5秒广播一次
                 
             except Exception as e:
                 self.logger.error(f"Real-time broadcast error: {e}")
@@ -1269,10 +1658,13 @@ class EnhancedWebInterface:
         self.running = False
         
         # 关闭所有WebSocket连接
-        for client in self.websocket_clients.copy():
+        for client in list(self.websocket_clients):
             try:
-                client.close()
+                await client.close(1001)
             except:
                 pass
         
+        if self.server:
+            self.server.should_exit = True
+        
         self.logger.info("Enhanced web interface stopped")
\ No newline at end of file
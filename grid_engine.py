@@ -113,18 +113,19 @@ class MarketAnalyzer:
         if len(self.price_history) < 2:
             return Decimal("0")
         
-        changes = []
-        for i in range(1, len(self.price_history)):
-            change = abs(self.price_history[i] - self.price_history[i-1]) / self.price_history[i-1]
-            changes.append(change)
+        # 计算标准差: 单次遍历累计 Σx 与 Σx²，方差 = E[x²] - E[x]²
+        prices = self.price_history
+        total = Decimal("0")
+        total_sq = Decimal("0")
+        for i in range(1, len(prices)):
+            change = abs(prices[i] - prices[i-1]) / prices[i-1]
+            total += change
+            total_sq += change * change
         
-        if not changes:
-            return Decimal("0")
-        
-        # 计算标准差
-        mean_change = sum(changes) / len(changes)
-        variance = sum((change - mean_change) ** 2 for change in changes) / len(changes)
-        return variance ** Decimal("0.5")
+        n = len(prices) - 1
+        mean_change = total / n
+        variance = max(total_sq / n - mean_change * mean_change, Decimal("0"))
+        return variance.sqrt()
 
 class RiskManager:
     """风险管理器"""
@@ -229,13 +230,13 @@ class GridTradingEngine:
             else:
                 order_size = self.config.insurance_size
             
-            orders_created = 0
+            orders: List[OrderInfo] = []
             
             # 创建买单
             for i, price in enumerate(grid_prices["buy_prices"]):
                 quantity = self.calculator.calculate_order_quantity(order_size, price)
                 
-                order = OrderInfo(
+                orders.append(OrderInfo(
                     id=f"{grid_level.value}_buy_{i}_{int(time.time())}",
                     exchange_order_id=None,
                     symbol=self.config.symbol,
@@ -245,16 +246,13 @@ class GridTradingEngine:
                     status=OrderStatus.PENDING,
                     grid_level=grid_level,
                     grid_index=i
-                )
-                
-                if await self._place_order(order):
-                    orders_created += 1
+                ))
             
             # 创建卖单
             for i, price in enumerate(grid_prices["sell_prices"]):
                 quantity = self.calculator.calculate_order_quantity(order_size, price)
                 
-                order = OrderInfo(
+                orders.append(OrderInfo(
                     id=f"{grid_level.value}_sell_{i}_{int(time.time())}",
                     exchange_order_id=None,
                     symbol=self.config.symbol,
@@ -264,9 +262,14 @@ class GridTradingEngine:
                     status=OrderStatus.PENDING,
                     grid_level=grid_level,
                     grid_index=i
-                )
-                
-                if await self._place_order(order):
+                ))
+            
+            # 整层订单一次事务写入，下单时不再逐单保存
+            self.db.save_orders_bulk(orders)
+            
+            orders_created = 0
+            for order in orders:
+                if await self._place_order(order, persisted=True):
                     orders_created += 1
             
             self.logger.info(f"Grid {grid_level.value} initialized with {orders_created} orders")
@@ -274,11 +277,12 @@ class GridTradingEngine:
         except Exception as e:
             self.logger.error(f"Failed to initialize grid {grid_level.value}: {e}")
     
-    async def _place_order(self, order: OrderInfo) -> bool:
+    async def _place_order(self, order: OrderInfo, persisted: bool = False) -> bool:
         """下单到交易所"""
         try:
             # 保存到数据库
-            self.db.save_order(order)
+            if not persisted:
+                self.db.save_order(order)
             
             # 模拟模式下不实际下单
             if self.config.use_testnet and hasattr(self.binance, 'testnet') and self.binance.testnet:
@@ -510,7 +514,7 @@ class GridTradingEngine:
                 # 如果完整性低于60%，重建网格
                 if integrity < 60:
                     last_rebuild = self.last_grid_rebuild.get(grid_level)
-                    if not last_rebuild or (datetime.now() - last_rebuild).seconds > 300:  # 5分钟间隔
+                    if not last_rebuild or (datetime.now() - last_rebuild).total_seconds() > 300:  # 5分钟间隔
                         self.logger.warning(f"Grid {grid_level.value} integrity low: {integrity:.1f}%")
                         await self._rebuild_grid(grid_level)
             
@@ -565,15 +569,15 @@ class GridTradingEngine:
     
     def get_status(self) -> SystemStatus:
         """获取系统状态"""
-        active_orders = self.db.get_active_orders()
+        active_orders = self.db.get_active_order_batch()
+        level_counts = active_orders.count_by_level()
         
         # 计算网格完整性
         grid_integrity = {}
         for grid_level in GridLevel:
-            level_orders = [o for o in active_orders if o.grid_level == grid_level]
             # 简化的完整性计算
             expected = 20  # 预期订单数
-            actual = len(level_orders)
+            actual = level_counts[grid_level]
             integrity = (actual / expected) * 100 if expected > 0 else 100
             grid_integrity[grid_level] = Decimal(str(min(integrity, 100)))
         
@@ -7,6 +7,7 @@ from typing import Dict, List, Tuple, Optional
 from decimal import Decimal
 from data_models import GridLevel, TradingConfig, MarketState
 from database_manager import DatabaseManager
+from metrics_kernels import sharpe_ratio, max_streaks
 
 class TechnicalIndicators:
     """技术指标计算器"""
@@ -471,6 +472,9 @@ class IntelligentOptimizer:
             total_profit = sum(trade.profit for trade in trades)
             avg_profit_per_trade = total_profit / total_trades if total_trades > 0 else 0
             
+            # Decimal 只在边界转换一次，后续统计在 float64 数组上由 JIT 内核完成
+            profits = np.fromiter((float(trade.profit) for trade in trades), dtype=np.float64, count=total_trades)
+            
             # 按网格层级统计
             level_performance = {}
             for level in GridLevel:
@@ -490,56 +494,26 @@ class IntelligentOptimizer:
                 'total_profit': float(total_profit),
                 'avg_profit_per_trade': float(avg_profit_per_trade),
                 'level_performance': level_performance,
-                'sharpe_ratio': self._calculate_sharpe_ratio(trades),
-                'max_consecutive_losses': self._calculate_max_consecutive_losses(trades)
+                'sharpe_ratio': self._calculate_sharpe_ratio(profits),
+                'max_consecutive_losses': self._calculate_max_consecutive_losses(profits)
             }
             
         except Exception as e:
             self.logger.error(f"Failed to get trading performance for {symbol}: {e}")
             return {}
     
-    def _calculate_sharpe_ratio(self, trades) -> float:
+    def _calculate_sharpe_ratio(self, profits: np.ndarray) -> float:
         """计算夏普比率"""
-        if len(trades) < 10:
-            return 0.0
-        
-        returns = [float(trade.profit) for trade in trades]
-        
-        if not returns:
-            return 0.0
-        
-        avg_return = sum(returns) / len(returns)
-        
-        if len(returns) < 2:
-            return 0.0
-        
-        variance = sum((r - avg_return) ** 2 for r in returns) / (len(returns) - 1)
-        std_dev = variance ** 0.5
-        
-        if std_dev == 0:
+        if len(profits) < 10:
             return 0.0
         
         # 简化的夏普比率计算
-        sharpe = avg_return / std_dev
-        
-        return sharpe
+        return float(sharpe_ratio(profits))
     
-    def _calculate_max_consecutive_losses(self, trades) -> int:
+    def _calculate_max_consecutive_losses(self, profits: np.ndarray) -> int:
         """计算最大连续亏损次数"""
-        if not trades:
-            return 0
-        
-        max_consecutive = 0
-        current_consecutive = 0
-        
-        for trade in trades:
-            if trade.profit <= 0:
-                current_consecutive += 1
-                max_consecutive = max(max_consecutive, current_consecutive)
-            else:
-                current_consecutive = 0
-        
-        return max_consecutive
+        _, max_consecutive = max_streaks(profits)
+        return int(max_consecutive)
     
     def _should_optimize(self, symbol: str, performance_data: Dict[str, any]) -> bool:
         """判断是否应该进行优化"""
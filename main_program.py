@@ -115,6 +115,7 @@ class GridTradingBot:
                 # 系统配置
                 check_interval=config_data.get('check_interval', 5),
                 web_port=config_data.get('web_port', 8080),
+                pragma_synchronous=config_data.get('pragma_synchronous', 'NORMAL'),
                 
                 # API配置
                 binance_api_key=config_data.get('binance_api_key', ''),
@@ -161,6 +162,7 @@ class GridTradingBot:
             # 系统配置
             'check_interval': 5,
             'web_port': 8080,
+            'pragma_synchronous': 'NORMAL',  # 回测可设为 OFF
             
             # API配置 - 需要用户填写
             'binance_api_key': 'YOUR_API_KEY_HERE',
@@ -211,7 +213,7 @@ class GridTradingBot:
             self.logger.info("Initializing system components...")
             
             # 1. 初始化数据库
-            self.db = DatabaseManager()
+            self.db = DatabaseManager(synchronous=self.config.pragma_synchronous)
             self.logger.info("Database initialized")
             
             # 2. 初始化Binance客户端
@@ -388,6 +390,7 @@ class GridTradingBot:
             # 清理数据库
             if self.db:
                 self.db.cleanup_old_data()
+                self.db.close()
             
             self.logger.info("✅ System stopped successfully")
             
@@ -421,6 +424,11 @@ class GridTradingBot:
         trades = self.db.get_trades(days)
         return [trade.to_dict() for trade in trades]
     
+    @property
+    def orders_version(self) -> int:
+        """订单版本号，订单写入后变化"""
+        return self.db.orders_version if self.db else 0
+    
     def get_orders(self) -> list:
         """获取活跃订单"""
         if not self.db:
@@ -0,0 +1,76 @@
+# metrics_kernels.py - 绩效指标 / 订单排序计算内核 (Numba JIT)
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # 未安装 numba 时退化为纯 Python 循环，结果一致
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# 显式签名在导入时即完成编译，cache=True 将机器码缓存到 __pycache__，首次调用无 JIT 延迟
+
+@njit("float64[:](float64[:])", cache=True, fastmath=True)
+def rolling_drawdown(cum_pnl):
+    """滚动回撤: 每个点相对历史峰值的回落"""
+    n = cum_pnl.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    
+    peak = cum_pnl[0]
+    for i in range(n):
+        if cum_pnl[i] > peak:
+            peak = cum_pnl[i]
+        out[i] = peak - cum_pnl[i]
+    return out
+
+@njit("float64(float64[:])", cache=True, fastmath=True)
+def sharpe_ratio(returns):
+    """夏普比率 (未年化，无风险利率为0)"""
+    n = returns.shape[0]
+    if n < 2:
+        return 0.0
+    
+    total = 0.0
+    for i in range(n):
+        total += returns[i]
+    mean = total / n
+    
+    sq = 0.0
+    for i in range(n):
+        diff = returns[i] - mean
+        sq += diff * diff
+    std = (sq / (n - 1)) ** 0.5
+    
+    if std == 0.0:
+        return 0.0
+    return mean / std
+
+@njit("UniTuple(int64, 2)(float64[:])", cache=True, fastmath=True)
+def max_streaks(pnl):
+    """最长连续盈利 / 连续亏损次数 (盈亏为0计为亏损)"""
+    best_win = 0
+    best_loss = 0
+    win = 0
+    loss = 0
+    for i in range(pnl.shape[0]):
+        if pnl[i] > 0:
+            win += 1
+            loss = 0
+        else:
+            loss += 1
+            win = 0
+        if win > best_win:
+            best_win = win
+        if loss > best_loss:
+            best_loss = loss
+    return best_win, best_loss
+
+@njit("int64[:](float64[:], float64, int64)", cache=True)
+def rank_by_distance_desc(prices, current, top_k):
+    """按与 current 的距离从远到近返回前 top_k 个下标 (稳定排序，距离相同保持原顺序)"""
+    distance = np.abs(prices - current)
+    order = np.argsort(-distance, kind='mergesort')
+    return order[:top_k]
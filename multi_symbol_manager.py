@@ -216,19 +216,19 @@ class MultiSymbolManager:
         if len(prices) < 2:
             return Decimal("0.05")
         
-        returns = []
+        # 单次遍历累计 Σr 与 Σr²，方差 = E[r²] - E[r]²
+        total = Decimal("0")
+        total_sq = Decimal("0")
         for i in range(1, len(prices)):
             ret = (prices[i] - prices[i-1]) / prices[i-1]
-            returns.append(ret)
+            total += ret
+            total_sq += ret * ret
         
-        if not returns:
-            return Decimal("0.05")
-        
-        mean_return = sum(returns) / len(returns)
-        variance = sum((ret - mean_return) ** 2 for ret in returns) / len(returns)
-        volatility = variance ** Decimal("0.5")
+        n = len(prices) - 1
+        mean_return = total / n
+        variance = max(total_sq / n - mean_return * mean_return, Decimal("0"))
         
-        return volatility
+        return variance.sqrt()
     
     async def _allocate_capital(self):
         """分配资金到各币种"""
@@ -3,7 +3,8 @@ import asyncio
 import json
 import logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Response, render_template_string, jsonify, request
+from data_models import dumps_json
 from threading import Thread
 import time
 
@@ -34,12 +35,18 @@ class WebInterface:
         
         @self.app.route('/api/trades')
         def api_trades():
+            if not self.bot.db:
+                return jsonify([])
+            
             days = request.args.get('days', 7, type=int)
-            return jsonify(self.bot.get_trades(days))
+            return self._json_response(dumps_json(self.bot.db.get_trades(days)))
         
         @self.app.route('/api/orders')
         def api_orders():
-            return jsonify(self.bot.get_orders())
+            if not self.bot.db:
+                return jsonify([])
+            
+            return self._json_response(dumps_json(self.bot.db.get_active_orders()))
         
         @self.app.route('/api/performance')
         def api_performance():
@@ -47,7 +54,7 @@ class WebInterface:
                 return jsonify({})
             
             metrics = self.bot.db.get_performance_metrics()
-            return jsonify(metrics.to_dict())
+            return self._json_response(metrics.to_json_bytes())
         
         @self.app.route('/api/chart_data')
         def api_chart_data():
@@ -61,6 +68,11 @@ class WebInterface:
         def api_system_info():
             return jsonify(self._get_system_info())
     
+    @staticmethod
+    def _json_response(payload: bytes) -> Response:
+        """已序列化的 JSON 字节直接作为响应体"""
+        return Response(payload, mimetype='application/json')
+    
     def _get_dashboard_template(self) -> str:
         """获取仪表板HTML模板"""
         return """